@@ -0,0 +1,83 @@
+from config import *
+
+
+class Clip:
+    def __init__(self, frames, frame_duration, loop=True, on_end=None):
+        # Animation clip
+        # A shared, read-only description of an animation: its frames, how long each frame
+        # is shown (in seconds), whether it loops, and what to call when a one-shot clip ends.
+        # on_end is called with the sprite whose animation ended.
+        self.frames = frames
+        self.frame_duration = frame_duration
+        self.loop = loop
+        self.on_end = on_end
+        self.duration = frame_duration * len(frames)
+
+
+class Animator:
+    def __init__(self, sprite, clips, name):
+        # Per-sprite animation state: the clip table it picks from, the playing clip and its time
+        self.sprite = sprite
+        self.clips = clips
+        self.name = None
+        self.clip = None
+        self.time = 0.0
+        self.finished = False
+        self.play(name)
+
+    def play(self, name, restart=False):
+        # switches to a clip by name, a clip that is already playing keeps going unless restarted
+        if name == self.name and not restart:
+            return
+        self.name = name
+        self.clip = self.clips[name]
+        self.time = 0.0
+        self.finished = False
+        self.sprite.image = self.clip.frames[0]
+
+    def advance(self, dt):
+        # moves the clip on by dt seconds and shows the frame for that time
+        if self.finished:
+            return
+        clip = self.clip
+        self.time += dt
+        index = int(self.time / clip.frame_duration)
+        if index >= len(clip.frames):
+            if clip.loop:
+                self.time %= clip.duration
+                index = int(self.time / clip.frame_duration) % len(clip.frames)
+            else:
+                # one-shot clips stay on their last frame
+                self.finished = True
+                self.sprite.image = clip.frames[-1]
+                if clip.on_end is not None:
+                    clip.on_end(self.sprite)
+                return
+        self.sprite.image = clip.frames[index]
+
+
+class AnimationSystem:
+    def __init__(self):
+        # Animation system
+        # Advances every animator by the elapsed time in a single pass per tick.
+        # Batches (like the enemy swarm) animate all of their entities in one call.
+        self.animators = set()
+        self.batches = []
+
+    def add(self, animator):
+        self.animators.add(animator)
+
+    def add_batch(self, batch):
+        # batch needs an animate(dt) method
+        self.batches.append(batch)
+
+    def update(self, dt):
+        for batch in self.batches:
+            batch.animate(dt)
+
+        # animators of sprites that have been killed or released are dropped
+        for animator in list(self.animators):
+            if animator.sprite.alive():
+                animator.advance(dt)
+            else:
+                self.animators.discard(animator)
@@ -0,0 +1,134 @@
+import glob
+import json
+import mmap
+import os
+import struct
+import sys
+
+import pygame
+from config import *
+
+# Asset manager
+# Every asset is named relative to IMG_DIR, so the game runs from any checkout.
+# Loaded images and fonts are cached, so a screen or button asking for the same file
+# again gets the already decoded one.
+#
+# The PNGs in IMG_DIR can also be packed into one bundle file of raw pixels:
+#   python assets.py pack
+# When the bundle exists it is memory-mapped at startup and images are read from it
+# without decoding PNGs. Images changed after the bundle was packed are loaded from their PNG.
+
+BUNDLE_FILE = os.path.join(IMG_DIR, "assets.bundle")
+BUNDLE_MAGIC = b"RPGBNDL1"
+BUNDLE_FORMAT = "RGBA"
+
+images = {}  # (name, alpha) -> surface
+fonts = {}  # (name, size) -> font
+bundle = None  # memory-mapped bundle, opened on first use
+bundle_index = None  # name -> {"offset", "size", "mtime"} in the bundle
+bundle_data = 0  # where the pixel data starts in the bundle
+
+
+def resolve(name):
+    # returns the full path of an asset named relative to IMG_DIR
+    return os.path.join(IMG_DIR, *name.replace("\\", "/").split("/"))
+
+
+def open_bundle():
+    # memory-maps the bundle once, returns its index (empty if there is no bundle)
+    global bundle, bundle_index, bundle_data
+    if bundle_index is not None:
+        return bundle_index
+
+    bundle_index = {}
+    if not os.path.exists(BUNDLE_FILE):
+        return bundle_index
+
+    with open(BUNDLE_FILE, "rb") as file:
+        bundle = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    # header: magic, index length, JSON index, then the pixel data
+    if bundle[:8] != BUNDLE_MAGIC:
+        return bundle_index
+    (index_size,) = struct.unpack_from("<I", bundle, 8)
+    bundle_index = json.loads(bundle[12 : 12 + index_size].decode("utf-8"))
+    bundle_data = 12 + index_size
+    return bundle_index
+
+
+def load_from_bundle(name):
+    # returns the bundled surface for an image, or None if it isn't bundled or is out of date
+    entry = open_bundle().get(name)
+    if entry is None or os.path.getmtime(resolve(name)) > entry["mtime"]:
+        return None
+    start = bundle_data + entry["offset"]
+    end = start + entry["size"][0] * entry["size"][1] * 4
+    # reads the pixels straight out of the mapped file, no copy or PNG decode
+    return pygame.image.frombuffer(
+        memoryview(bundle)[start:end], entry["size"], BUNDLE_FORMAT
+    )
+
+
+def load_image(name, alpha=False):
+    # loads an image once and returns the cached surface afterwards
+    key = (name, alpha)
+    image = images.get(key)
+    if image is not None:
+        return image
+
+    image = load_from_bundle(name)
+    if image is None:
+        image = pygame.image.load(resolve(name))
+
+    # converts to the display's pixel format (also copies bundled pixels out of the mapped file)
+    if pygame.display.get_surface() is not None:
+        image = image.convert_alpha() if alpha else image.convert()
+    else:
+        image = image.copy()
+
+    images[key] = image
+    return image
+
+
+def load_font(name, size):
+    # opens a font file once per size and returns the cached font afterwards
+    key = (name, size)
+    font = fonts.get(key)
+    if font is None:
+        font = fonts[key] = pygame.font.Font(resolve(name), size)
+    return font
+
+
+def pack_bundle():
+    # packs every PNG in IMG_DIR into the bundle file
+    entries = {}
+    pixels = []
+    offset = 0
+    for path in sorted(glob.glob(os.path.join(IMG_DIR, "*.png"))):
+        name = os.path.relpath(path, IMG_DIR).replace(os.sep, "/")
+        image = pygame.image.load(path)
+        data = pygame.image.tobytes(image, BUNDLE_FORMAT)
+        # offsets are relative to the start of the pixel data, which follows the index
+        entries[name] = {
+            "offset": offset,
+            "size": image.get_size(),
+            "mtime": os.path.getmtime(path),
+        }
+        pixels.append(data)
+        offset += len(data)
+
+    index = json.dumps(entries).encode("utf-8")
+    with open(BUNDLE_FILE, "wb") as file:
+        file.write(BUNDLE_MAGIC)
+        file.write(struct.pack("<I", len(index)))
+        file.write(index)
+        for data in pixels:
+            file.write(data)
+    return entries
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["pack"]:
+        packed = pack_bundle()
+        print(f"packed {len(packed)} images into {BUNDLE_FILE}")
+    else:
+        print("usage: python assets.py pack")
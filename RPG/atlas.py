@@ -0,0 +1,260 @@
+import glob
+import json
+import os
+import re
+import sys
+
+import pygame
+from assets import load_image, resolve
+from config import *
+
+# Texture atlas
+# Frames from many spritesheets and single-image animations are packed offline into a few
+# large pages, with an index of named frames and animations:
+#   python atlas.py build
+# reads atlas_manifest.json and writes atlas_<n>.png pages and atlas.json into IMG_DIR.
+#
+# At runtime every frame is a subsurface of a page, so thousands of frames are a handful of
+# surfaces. Frames of colorkey sheets share opaque pages keyed on black, like the game's own
+# frames, the others go on pages with per-pixel alpha. Spritesheet.get_sprite() takes frames from the atlas when it has them, and frames
+# and animations can be looked up by name ("character/down/0", "dungeon/coin").
+# Sources changed after the atlas was built are read from their own files again.
+#
+# The manifest lists sheets, each named and read from an image relative to IMG_DIR:
+#   "frames"  {animation: [[x, y], ...]}, cut with the sheet's "size" (default TILESIZE)
+#   "grid"    [width, height], every non-empty cell, one animation per row ("row0", ...)
+#   "files"   a glob pattern, files named like coin_1.png, coin_2.png form the animation "coin"
+# "colorkey": true sheets are cut like the game cuts them: black is transparent.
+
+MANIFEST_FILE = os.path.join(BASE_DIR, "atlas_manifest.json")
+INDEX_FILE = os.path.join(IMG_DIR, "atlas.json")
+PAGE_NAME = "atlas_{}.png"
+
+atlas = None  # the loaded atlas, False if there is none
+
+
+class Atlas:
+    def __init__(self, index):
+        self.pages = []
+        for page in index["pages"]:
+            if page["colorkey"]:
+                surface = load_image(page["name"])
+                surface.set_colorkey(BLACK)
+            else:
+                surface = load_image(page["name"], alpha=True)
+            self.pages.append(surface)
+        self.frames = {}  # frame name -> surface
+        self.sources = {}  # (image, x, y, width, height) -> frame name
+        self.animations = index["animations"]  # animation name -> list of frame names
+        self.sheet_names = {}  # image -> sheet name
+
+        for sheet in index["sheets"]:
+            # a source changed since the build is left to its own file
+            path = resolve(sheet["image"]) if "image" in sheet else None
+            if path is not None and os.path.getmtime(path) > sheet["mtime"]:
+                continue
+            if path is not None:
+                self.sheet_names[sheet["image"]] = sheet["name"]
+            for name, (page, x, y, width, height), source in sheet["frames"]:
+                self.frames[name] = self.pages[page].subsurface((x, y, width, height))
+                if source is not None:
+                    self.sources[tuple(source)] = name
+
+    def frame(self, name):
+        return self.frames.get(name)
+
+    def animation(self, name):
+        # returns the frames of a named animation, or None
+        names = self.animations.get(name)
+        if names is None or any(frame not in self.frames for frame in names):
+            return None
+        return [self.frames[frame] for frame in names]
+
+    def source_frame(self, image, x, y, width, height):
+        # returns the frame cut from image at x/y, or None if the atlas doesn't have it
+        name = self.sources.get((image, x, y, width, height))
+        return None if name is None else self.frames[name]
+
+
+def load_atlas():
+    # loads the atlas once, returns None if it hasn't been built
+    global atlas
+    if atlas is None:
+        atlas = False
+        if os.path.exists(INDEX_FILE):
+            with open(INDEX_FILE) as file:
+                atlas = Atlas(json.load(file))
+    return atlas or None
+
+
+def cut(image, rect, colorkey):
+    # returns one frame of a source image as a surface with per-pixel alpha
+    frame = pygame.Surface(rect.size, pygame.SRCALPHA)
+    if colorkey:
+        # the game draws these frames from an opaque copy with black as the colorkey
+        opaque = pygame.Surface(rect.size)
+        opaque.blit(image, (0, 0), rect)
+        opaque.set_colorkey(BLACK)
+        frame.blit(opaque, (0, 0))
+    else:
+        frame.blit(image, (0, 0), rect)
+    return frame
+
+
+def read_sheet(sheet):
+    # returns a sheet's frames as (frame name, surface, source rect or None) and its animations
+    frames = []
+    animations = {}
+    name = sheet["name"]
+    colorkey = sheet.get("colorkey", False)
+
+    if "files" in sheet:
+        paths = sorted(glob.glob(resolve(sheet["files"]), recursive=True))
+        numbered = {}
+        for path in paths:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            match = re.match(r"(.*)_(\d+)$", stem)
+            animation, number = (match.group(1), int(match.group(2))) if match else (stem, 0)
+            numbered.setdefault(animation, []).append((number, path))
+        for animation, files in sorted(numbered.items()):
+            names = []
+            for index, (number, path) in enumerate(sorted(files)):
+                image = pygame.image.load(path)
+                if colorkey:
+                    image = image.convert()
+                frame_name = f"{name}/{animation}/{index}"
+                frames.append((frame_name, cut(image, image.get_rect(), colorkey), None))
+                names.append(frame_name)
+            animations[f"{name}/{animation}"] = names
+        return frames, animations
+
+    image = pygame.image.load(resolve(sheet["image"]))
+    if colorkey:
+        # the game loads these sheets without alpha, whatever alpha the file has is dropped
+        image = image.convert()
+    if "grid" in sheet:
+        width, height = sheet["grid"]
+        positions = {}
+        for row in range(image.get_height() // height):
+            cells = []
+            for col in range(image.get_width() // width):
+                rect = pygame.Rect(col * width, row * height, width, height)
+                # empty cells at the end of a row aren't frames
+                if image.subsurface(rect).get_bounding_rect().width:
+                    cells.append((rect.x, rect.y))
+            if cells:
+                positions[f"row{row}"] = cells
+    else:
+        width = height = sheet.get("size", TILESIZE)
+        positions = sheet["frames"]
+
+    for animation, cells in positions.items():
+        names = []
+        for index, (x, y) in enumerate(cells):
+            rect = pygame.Rect(x, y, width, height)
+            frame_name = f"{name}/{animation}/{index}"
+            source = [sheet["image"], x, y, width, height]
+            frames.append((frame_name, cut(image, rect, colorkey), source))
+            names.append(frame_name)
+        animations[f"{name}/{animation}"] = names
+    return frames, animations
+
+
+def pack(sizes, page_size):
+    # shelf packing: frames sorted by height fill rows left to right, rows fill pages top down
+    # returns (page, x, y) for every size, in the order given
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    places = [None] * len(sizes)
+    page = x = y = shelf = 0
+    for i in order:
+        width, height = sizes[i]
+        if width > page_size or height > page_size:
+            raise ValueError(f"a {width}x{height} frame doesn't fit on a {page_size} page")
+        if x + width > page_size:
+            # next shelf
+            x, y, shelf = 0, y + shelf, 0
+        if y + height > page_size:
+            # next page
+            page, x, y, shelf = page + 1, 0, 0, 0
+        places[i] = (page, x, y)
+        x += width
+        shelf = max(shelf, height)
+    return places
+
+
+def build(manifest_path=MANIFEST_FILE):
+    # packs every sheet of the manifest into atlas pages, writes the pages and the index
+    with open(manifest_path) as file:
+        manifest = json.load(file)
+    # converting surfaces needs a display, a hidden one will do
+    if pygame.display.get_surface() is None:
+        pygame.display.set_mode((1, 1), pygame.HIDDEN)
+    page_size = manifest.get("page_size", 1024)
+
+    sheets = []
+    animations = {}
+    # unique frame surfaces to pack, colorkey frames and alpha frames go on separate pages:
+    # colorkey pages are drawn as opaque surfaces with a colorkey, which blits faster
+    surfaces = {True: [], False: []}
+    pixels = {}  # (colorkey, frame pixels) -> index, identical frames are stored once
+    for sheet in manifest["sheets"]:
+        colorkey = sheet.get("colorkey", False)
+        frames, sheet_animations = read_sheet(sheet)
+        entry = {"name": sheet["name"], "frames": []}
+        if "image" in sheet:
+            entry["image"] = sheet["image"]
+            entry["mtime"] = os.path.getmtime(resolve(sheet["image"]))
+        for frame_name, surface, source in frames:
+            key = (colorkey, surface.get_size(), pygame.image.tobytes(surface, "RGBA"))
+            if key not in pixels:
+                pixels[key] = len(surfaces[colorkey])
+                surfaces[colorkey].append(surface)
+            entry["frames"].append([frame_name, (colorkey, pixels[key]), source])
+        sheets.append(entry)
+        animations.update(sheet_animations)
+
+    pages = []  # {"name", "colorkey"}
+    places = {}  # colorkey -> (page, x, y) of every surface
+    for colorkey, group in surfaces.items():
+        first_page = len(pages)
+        group_places = pack([surface.get_size() for surface in group], page_size)
+        page_count = max((place[0] for place in group_places), default=-1) + 1
+        for number in range(page_count):
+            # pages are cropped to what they use
+            width = height = 0
+            for surface, (page, x, y) in zip(group, group_places):
+                if page == number:
+                    width = max(width, x + surface.get_width())
+                    height = max(height, y + surface.get_height())
+            if colorkey:
+                # transparent pixels become the black colorkey
+                page_surface = pygame.Surface((width, height))
+                page_surface.fill(BLACK)
+            else:
+                page_surface = pygame.Surface((width, height), pygame.SRCALPHA)
+            for surface, (page, x, y) in zip(group, group_places):
+                if page == number:
+                    page_surface.blit(surface, (x, y))
+            name = PAGE_NAME.format(first_page + number)
+            pygame.image.save(page_surface, resolve(name))
+            pages.append({"name": name, "colorkey": colorkey})
+        places[colorkey] = [(first_page + page, x, y) for page, x, y in group_places]
+
+    for entry in sheets:
+        for frame in entry["frames"]:
+            colorkey, index = frame[1]
+            page, x, y = places[colorkey][index]
+            frame[1] = [page, x, y, *surfaces[colorkey][index].get_size()]
+
+    with open(INDEX_FILE, "w") as file:
+        json.dump({"pages": pages, "sheets": sheets, "animations": animations}, file)
+    return len(surfaces[True]) + len(surfaces[False]), len(pages)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["build"]:
+        pygame.init()
+        frames, pages = build()
+        print(f"packed {frames} frames into {pages} pages, index in {INDEX_FILE}")
+    else:
+        print("usage: python atlas.py build")
@@ -0,0 +1,236 @@
+import os
+
+# Headless: the dummy drivers need no window or sound card
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+# SDL would turn SIGTERM into a quit event, then the pool couldn't stop its workers
+os.environ.setdefault("SDL_NO_SIGNAL_HANDLERS", "1")
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import random
+import time
+
+import numpy as np
+from config import *
+from controls import *
+from rpg_game import Game
+from bench import percentile
+from mapfile import generate_map
+
+# Batch simulation runner
+# Plays many headless sessions across a process pool, for balancing and soak tests.
+# Every combination of the given settings is played --runs times with its own seed, by
+# a scripted or random player, and the results stream back as sessions finish.
+#
+#   python batch.py --runs 200 --enemies 50 100 --speed 1 2 --policy idle random
+#   python batch.py --runs 50 --session session.json --speed 1 2 3
+#   python batch.py ... --out results.jsonl    also writes every session's result as a JSON line
+#
+# Every worker process starts fresh (spawn) and builds its own Game, so no pygame state is
+# shared between processes.
+
+POLICIES = ["idle", "random"]
+
+
+class RandomPolicy(Controls):
+    def __init__(self, seed):
+        # A player that walks in random directions for random stretches and swings at random
+        Controls.__init__(self)
+        self.rng = random.Random(seed)
+        self.held_state = 0
+        self.hold = 0  # ticks left before picking a new direction
+
+    def read(self):
+        if self.hold <= 0:
+            self.held_state = self.rng.choice(
+                [0, ACTION_LEFT, ACTION_RIGHT, ACTION_UP, ACTION_DOWN]
+            ) | self.rng.choice([0, ACTION_UP, ACTION_DOWN, ACTION_LEFT, ACTION_RIGHT])
+            self.hold = self.rng.randint(10, 90)
+        self.hold -= 1
+        state = self.held_state
+        if self.rng.random() < 0.05:
+            state |= ACTION_ATTACK
+        return state
+
+
+game = None  # the worker process's game, built once by start_worker
+
+
+def start_worker():
+    # runs once in every worker process
+    global game
+    game = Game()
+    game.realtime = False
+
+
+def play(job):
+    # plays one session, returns its metrics
+    if job["session"]:
+        game.controls = Replay(job["session"])
+        game.level = game.controls.level
+        seed = game.controls.seed
+    else:
+        seed = job["seed"]
+        cols, rows = job["map"]
+        game.level = generate_map(
+            cols, rows, job["enemies"], np.random.default_rng(seed), job["walls"]
+        )
+        if job["policy"] == "random":
+            game.controls = RandomPolicy(seed)
+        else:
+            game.controls = Controls()
+    game.new(seed)
+    game.swarm.speed = job["speed"]
+
+    enemies = game.swarm.count
+    frame_times = []
+    survived = 0
+    while survived < job["ticks"] and game.playing:
+        start = time.perf_counter()
+        game.update()
+        if job["draw"]:
+            game.draw()
+        frame_times.append((time.perf_counter() - start) * 1000)
+        if game.playing:
+            survived += 1
+
+    return {
+        "job": job,
+        "survived": survived,  # ticks the player lived
+        "alive": game.player.alive(),
+        "kills": enemies - game.swarm.count,
+        "frame_mean": sum(frame_times) / max(1, len(frame_times)),
+        "frame_p95": percentile(frame_times, 95) if frame_times else 0.0,
+    }
+
+
+def make_jobs(args):
+    # one job per run of every combination of settings
+    jobs = []
+    seed = args.seed
+    if args.session:
+        settings = itertools.product([None], [0], ["session"], args.speed)
+    else:
+        settings = itertools.product(args.map, args.enemies, args.policy, args.speed)
+    for map_size, enemies, policy, speed in settings:
+        for run in range(args.runs):
+            jobs.append(
+                {
+                    "seed": seed,
+                    "map": map_size,
+                    "walls": args.walls,
+                    "enemies": enemies,
+                    "policy": policy,
+                    "speed": speed,
+                    "session": args.session,
+                    "ticks": args.ticks,
+                    "draw": not args.no_draw,
+                }
+            )
+            seed += 1
+    return jobs
+
+
+def group_key(job):
+    # results are aggregated per combination of settings
+    return (
+        f"map={'session' if job['map'] is None else '%dx%d' % tuple(job['map'])} "
+        f"enemies={job['enemies']} policy={job['policy']} speed={job['speed']}"
+    )
+
+
+def aggregate(results):
+    # summarises the results of every combination of settings
+    groups = {}
+    for result in results:
+        groups.setdefault(group_key(result["job"]), []).append(result)
+
+    summary = {}
+    for key, group in groups.items():
+        survived = [result["survived"] for result in group]
+        summary[key] = {
+            "runs": len(group),
+            "survival_rate": sum(result["alive"] for result in group) / len(group),
+            "survived_mean": sum(survived) / len(group),
+            "survived_p50": percentile(survived, 50),
+            "kills_mean": sum(result["kills"] for result in group) / len(group),
+            "frame_mean": sum(result["frame_mean"] for result in group) / len(group),
+            "frame_p95": percentile([result["frame_p95"] for result in group], 95),
+        }
+    return summary
+
+
+def print_summary(summary):
+    header = f"{'settings':<48}" + "".join(
+        f"{name:>10}" for name in ["runs", "alive", "ticks", "kills", "ms", "p95 ms"]
+    )
+    print(header)
+    print("-" * len(header))
+    for key, stats in sorted(summary.items()):
+        print(
+            f"{key:<48}"
+            f"{stats['runs']:>10}"
+            f"{stats['survival_rate']:>10.0%}"
+            f"{stats['survived_mean']:>10.0f}"
+            f"{stats['kills_mean']:>10.1f}"
+            f"{stats['frame_mean']:>10.3f}"
+            f"{stats['frame_p95']:>10.3f}"
+        )
+
+
+def parse_map(text):
+    cols, _, rows = text.partition("x")
+    return (int(cols), int(rows))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel batch simulation runner")
+    parser.add_argument("--runs", type=int, default=20, help="sessions per combination")
+    parser.add_argument("--ticks", type=int, default=3600, help="longest session, in ticks")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the first session")
+    parser.add_argument("--enemies", type=int, nargs="+", default=[100])
+    parser.add_argument("--speed", type=int, nargs="+", default=[ENEMY_SPEED])
+    parser.add_argument(
+        "--map", type=parse_map, nargs="+", default=[(60, 40)], help="map sizes, like 60x40"
+    )
+    parser.add_argument("--walls", type=float, default=0.04, help="share of wall tiles")
+    parser.add_argument("--policy", nargs="+", default=["random"])
+    parser.add_argument("--session", help="replay a recorded session instead of a policy")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--no-draw", action="store_true", help="only time the simulation")
+    parser.add_argument("--out", help="write every session's result to this JSON lines file")
+    args = parser.parse_args()
+    for policy in args.policy:
+        if policy not in POLICIES:
+            parser.error(f"unknown policy {policy}, choose from {', '.join(POLICIES)}")
+
+    jobs = make_jobs(args)
+    results = []
+    out = open(args.out, "w") if args.out else None
+    start = time.perf_counter()
+    # spawned workers import pygame themselves instead of inheriting this process's state
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(args.workers, initializer=start_worker) as pool:
+        for result in pool.imap_unordered(play, jobs):
+            results.append(result)
+            if out:
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+            print(
+                f"\r{len(results)}/{len(jobs)} sessions "
+                f"({time.perf_counter() - start:.1f} s)",
+                end="",
+                flush=True,
+            )
+    print()
+    if out:
+        out.close()
+
+    print_summary(aggregate(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import os
+
+# Headless: the dummy drivers need no window or sound card, so this runs on a CI box
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import sys
+import time
+
+import pygame
+from config import *
+from rpg_game import Game
+from sprites import *
+from controls import *
+from mapfile import generate_map, save_map
+import numpy as np
+
+# Headless benchmark harness
+# Runs scripted scenarios for a fixed number of ticks and reports frame-time percentiles
+# for each phase of the game loop (events, update, draw).
+#
+#   python bench.py                      runs every scenario and prints the results
+#   python bench.py enemies_1000 attacks runs only the named scenarios
+#   python bench.py --save               stores the results as the baseline
+#   python bench.py --check              fails (exit code 1) if a phase regressed against the baseline
+#   python bench.py --replay session.json times a session recorded with rpg_game.py --record
+#
+# The latest results are written to bench_results.json, the baseline to bench_baseline.json.
+# The baseline depends on the machine, so it isn't kept in the repo; tests/test_bench.py
+# runs short scenarios and fails if a frame's p95 goes over the 60 FPS frame budget.
+
+RESULTS_FILE = os.path.join(BASE_DIR, "bench_results.json")
+BASELINE_FILE = os.path.join(BASE_DIR, "bench_baseline.json")
+
+PHASES = ["events", "update", "draw", "frame"]
+PERCENTILES = [50, 95, 99]
+
+# A phase regresses if its p95 is more than TOLERANCE times the baseline,
+# plus a small absolute margin so sub-millisecond phases don't fail on timer noise
+TOLERANCE = 1.5
+MARGIN_MS = 0.1
+
+
+# name -> (map size in tiles or None for the config tilemap, enemy count, attack every n ticks)
+SCENARIOS = {
+    "default": (None, 0, 0),
+    "enemies_100": ((60, 40), 100, 0),
+    "enemies_1000": ((120, 80), 1000, 0),
+    "large_map": ((300, 300), 200, 0),
+    "attacks": ((60, 40), 300, 4),
+    "huge_map": ((4000, 4000), 2000, 0),
+}
+
+# scenarios whose map is generated straight into a map file and streamed from disk
+MAP_FILE_SCENARIOS = {"huge_map"}
+MAP_FILE = os.path.join(BASE_DIR, "bench_map.rpgmap")
+
+
+def percentile(values, pct):
+    # nearest-rank percentile
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_scenario(game, name, ticks, seed):
+    map_size, enemies, attack_every = SCENARIOS[name]
+
+    if map_size is None:
+        game.level = tilemap
+    else:
+        level = generate_map(map_size[0], map_size[1], enemies, np.random.default_rng(seed))
+        if name in MAP_FILE_SCENARIOS:
+            save_map(level, MAP_FILE)
+            game.level = MAP_FILE
+        else:
+            game.level = level
+
+    start = time.perf_counter()
+    game.new(seed)
+    load_ms = (time.perf_counter() - start) * 1000
+    result = time_ticks(game, ticks, attack_every)
+    result["load_ms"] = load_ms
+    if name in MAP_FILE_SCENARIOS:
+        os.remove(MAP_FILE)
+    return result
+
+
+def run_replay(game, path):
+    # times a recorded session, tick for tick as it was played
+    game.controls = Replay(path)
+    game.level = game.controls.level
+    game.new(game.controls.seed)
+    result = time_ticks(game, len(game.controls.ticks))
+    game.controls = Controls()
+    return result
+
+
+def time_ticks(game, ticks, attack_every=0):
+    # runs the game for a number of ticks, one tick per frame, timing every phase
+    times = {phase: [] for phase in PHASES}
+    deaths = 0
+    for tick in range(ticks):
+        if attack_every and tick % attack_every == 0:
+            game.controls.press(ACTION_ATTACK)
+
+        start = time.perf_counter()
+        game.events()
+        events_done = time.perf_counter()
+        game.update()
+        update_done = time.perf_counter()
+        game.draw()
+        draw_done = time.perf_counter()
+
+        times["events"].append((events_done - start) * 1000)
+        times["update"].append((update_done - events_done) * 1000)
+        times["draw"].append((draw_done - update_done) * 1000)
+        times["frame"].append((draw_done - start) * 1000)
+
+        # the run keeps going after the player dies so every scenario times the same ticks
+        if not game.playing:
+            deaths += 1
+            game.playing = True
+
+    result = {
+        "ticks": ticks,
+        "deaths": deaths,
+        "sprites": len(game.all_sprites),
+        "attack_pool": game.attack_pool.stats(),
+        "enemy_lod": dict(game.swarm.lod_counts),  # enemies per level of detail band at the end
+    }
+    for phase in PHASES:
+        result[phase] = {f"p{pct}": percentile(times[phase], pct) for pct in PERCENTILES}
+        result[phase]["mean"] = sum(times[phase]) / ticks
+    return result
+
+
+def print_results(results):
+    header = f"{'scenario':<14} {'phase':<7}" + "".join(
+        f"{name:>9}" for name in ["p50", "p95", "p99", "mean"]
+    )
+    print(header)
+    print("-" * len(header))
+    for name, result in results.items():
+        for phase in PHASES:
+            stats = result[phase]
+            print(
+                f"{name:<14} {phase:<7}"
+                + "".join(f"{stats[key]:>9.3f}" for key in ["p50", "p95", "p99", "mean"])
+            )
+    print("(times in ms)")
+
+
+def check_results(results, baseline):
+    # returns a line for every phase whose p95 regressed against the baseline
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for phase in PHASES:
+            old = baseline[name][phase]["p95"]
+            new = result[phase]["p95"]
+            if new > old * TOLERANCE + MARGIN_MS:
+                regressions.append(
+                    f"{name} {phase}: p95 {new:.3f} ms (baseline {old:.3f} ms)"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmark harness")
+    parser.add_argument("scenarios", nargs="*", help="scenarios to run (default: all)")
+    parser.add_argument("--ticks", type=int, default=600)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", action="store_true", help="store results as the baseline")
+    parser.add_argument("--check", action="store_true", help="fail on regressions")
+    parser.add_argument(
+        "--replay",
+        metavar="FILE",
+        action="append",
+        default=[],
+        help="also time a recorded session (rpg_game.py --record), can be repeated",
+    )
+    args = parser.parse_args()
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario {name}, choose from {', '.join(SCENARIOS)}")
+
+    game = Game()
+    game.realtime = False
+
+    results = {}
+    if args.scenarios or not args.replay:
+        for name in args.scenarios or list(SCENARIOS):
+            results[name] = run_scenario(game, name, args.ticks, args.seed)
+    for path in args.replay:
+        # sessions are named after their file, so their baselines are kept apart
+        name = "replay:" + os.path.splitext(os.path.basename(path))[0]
+        results[name] = run_replay(game, path)
+    pygame.quit()
+
+    print_results(results)
+    with open(RESULTS_FILE, "w") as file:
+        json.dump(results, file, indent=2)
+
+    if args.save:
+        with open(BASELINE_FILE, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"baseline saved to {BASELINE_FILE}")
+
+    if args.check:
+        if not os.path.exists(BASELINE_FILE):
+            print(f"no baseline at {BASELINE_FILE}, run with --save first")
+            sys.exit(1)
+        with open(BASELINE_FILE) as file:
+            baseline = json.load(file)
+        regressions = check_results(results, baseline)
+        if regressions:
+            print("performance regressions:")
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print("no regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
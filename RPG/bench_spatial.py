@@ -0,0 +1,135 @@
+import sys
+import time
+
+import numpy as np
+import pygame
+from config import *
+from spatial import *
+
+# Spatial hash benchmark
+# Compares the old full-group scans (pygame.sprite.spritecollide against every enemy)
+# with spatial hash queries, for a player and a few live attacks among N wandering enemies,
+# plus the renderer's query for the sprites inside the camera view.
+# Enemies move like the swarm moves them: positions in NumPy arrays copied to the rects,
+# and with the hash only enemies that crossed into another cell are re-bucketed (see
+# EnemySwarm.sync). The hash costs that upkeep every frame, so the totals compare
+# move + query of both.
+# Run with: python bench_spatial.py [frames]
+
+ENEMY_COUNTS = [10, 100, 1000, 10000]
+ATTACK_COUNT = 4
+# the world grows with the enemy count so density stays the same
+TILES_PER_ENEMY = 16
+
+
+class Entity(pygame.sprite.Sprite):
+    def __init__(self, x, y):
+        pygame.sprite.Sprite.__init__(self)
+        self.rect = pygame.Rect(x, y, TILESIZE, TILESIZE)
+
+
+def make_world(count, rng):
+    # builds a square world with count enemies, one player and a few attacks in it
+    # the enemies' positions are arrays, like the swarm's
+    side = int((count * TILES_PER_ENEMY) ** 0.5 + 1) * TILESIZE
+    x = rng.integers(0, side - TILESIZE, count)
+    y = rng.integers(0, side - TILESIZE, count)
+    enemies = [Entity(enemy_x, enemy_y) for enemy_x, enemy_y in zip(x.tolist(), y.tolist())]
+    player = Entity(side // 2, side // 2)
+    attacks = [
+        Entity(player.rect.x + dx, player.rect.y + dy)
+        for dx, dy in [(TILESIZE, 0), (-TILESIZE, 0), (0, TILESIZE), (0, -TILESIZE)]
+    ][:ATTACK_COUNT]
+    # the camera view around the player, the renderer culls sprites with it
+    view = Entity(0, 0)
+    view.rect.size = (WIN_WIDTH, WIN_HEIGHT)
+    view.rect.center = player.rect.center
+    return side, x, y, enemies, player, attacks, view
+
+
+def wander(x, y, side, rng):
+    # moves every enemy by one pixel in one batch, like EnemySwarm.step
+    np.clip(x + rng.choice((-1, 1), len(x)), 0, side - TILESIZE, out=x)
+    np.clip(y + rng.choice((-1, 1), len(y)), 0, side - TILESIZE, out=y)
+
+
+def sync_rects(enemies, x, y):
+    # copies the positions to the enemies' rects, like EnemySwarm.sync
+    for enemy, enemy_x, enemy_y in zip(enemies, x.tolist(), y.tolist()):
+        enemy.rect.x = enemy_x
+        enemy.rect.y = enemy_y
+
+
+def bench_scan(count, frames):
+    rng = np.random.default_rng(count)
+    side, x, y, enemies, player, attacks, view = make_world(count, rng)
+    group = pygame.sprite.Group(enemies)
+
+    move_time = query_time = 0.0
+    for _ in range(frames):
+        start = time.perf_counter()
+        wander(x, y, side, rng)
+        sync_rects(enemies, x, y)
+        moved = time.perf_counter()
+        pygame.sprite.spritecollide(player, group, False)
+        for attack in attacks:
+            pygame.sprite.spritecollide(attack, group, False)
+        pygame.sprite.spritecollide(view, group, False)
+        query_time += time.perf_counter() - moved
+        move_time += moved - start
+    return move_time / frames, query_time / frames
+
+
+def bench_hash(count, frames):
+    rng = np.random.default_rng(count)
+    side, x, y, enemies, player, attacks, view = make_world(count, rng)
+    group = pygame.sprite.Group(enemies)
+    entities = SpatialHash()
+    entities.add(enemies, player, attacks)
+    cell = entities.cell_size
+
+    move_time = query_time = 0.0
+    for _ in range(frames):
+        start = time.perf_counter()
+        old_x = x.copy()
+        old_y = y.copy()
+        wander(x, y, side, rng)
+        sync_rects(enemies, x, y)
+        # only enemies whose cell changed are re-bucketed, found in one batch
+        changed_cell = np.nonzero(
+            (x // cell != old_x // cell) | (y // cell != old_y // cell)
+        )[0]
+        for index in changed_cell.tolist():
+            entities.move(enemies[index])
+        moved = time.perf_counter()
+        entities.collide(player, group)
+        for attack in attacks:
+            entities.collide(attack, group)
+        entities.query_rect(view.rect)
+        query_time += time.perf_counter() - moved
+        move_time += moved - start
+    return move_time / frames, query_time / frames
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    print(f"{frames} frames per run, {ATTACK_COUNT} attacks and the view, times in ms per frame")
+    print(
+        f"{'enemies':>8} | {'scan move':>9} | {'hash move':>9} | {'scan query':>10} | "
+        f"{'hash query':>10} | {'scan total':>10} | {'hash total':>10} | {'speedup':>7}"
+    )
+    for count in ENEMY_COUNTS:
+        scan_move, scan_query = bench_scan(count, frames)
+        hash_move, hash_query = bench_hash(count, frames)
+        scan_total = scan_move + scan_query
+        hash_total = hash_move + hash_query
+        print(
+            f"{count:>8} | {scan_move * 1000:>9.3f} | {hash_move * 1000:>9.3f} | "
+            f"{scan_query * 1000:>10.3f} | {hash_query * 1000:>10.3f} | "
+            f"{scan_total * 1000:>10.3f} | {hash_total * 1000:>10.3f} | "
+            f"{scan_total / hash_total:>6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import pygame
+from config import *
+
+
+class Camera:
+    def __init__(self, width, height, world_width, world_height):
+        # Camera
+        # Entities keep their rects in world space; the camera only decides which part
+        # of the world is on screen, and the offset is applied when drawing
+        self.rect = pygame.Rect(0, 0, width, height)  # visible area in world space
+        self.prev_pos = self.rect.topleft  # position before the last update, for interpolation
+        self.world_width = world_width
+        self.world_height = world_height
+
+    def update(self, target):
+        self.prev_pos = self.rect.topleft
+        # centers the camera on the target
+        x = target.rect.centerx - self.rect.width // 2
+        y = target.rect.centery - self.rect.height // 2
+
+        # limit scrolling to the edges of the world
+        x = max(0, min(x, self.world_width - self.rect.width))  # left/right
+        y = max(0, min(y, self.world_height - self.rect.height))  # top/bottom
+
+        self.rect.topleft = (x, y)
+
+    def snap(self, target):
+        # jumps straight to the target without interpolating from the old position
+        self.update(target)
+        self.prev_pos = self.rect.topleft
+
+    def view(self, alpha):
+        # returns the visible area between the last two updates, alpha is 0 (previous) to 1 (current)
+        prev_x, prev_y = self.prev_pos
+        return pygame.Rect(
+            round(prev_x + (self.rect.x - prev_x) * alpha),
+            round(prev_y + (self.rect.y - prev_y) * alpha),
+            self.rect.width,
+            self.rect.height,
+        )
+
+    def apply(self, rect):
+        # converts a world space rect to a screen space rect
+        return rect.move(-self.rect.x, -self.rect.y)
+
+    def apply_pos(self, x, y):
+        # converts a world space position to a screen space position
+        return x - self.rect.x, y - self.rect.y
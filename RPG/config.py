@@ -1,8 +1,45 @@
+import os
+
 WIN_SIZE = WIN_WIDTH, WIN_HEIGHT = 960, 540  # 30 tiles
 TILESIZE = 32  # Sets the sprite resolution
-FPS = 60  # Sets the game FPS
-PLAYER_SPEED = 1  # Sets the player speed
-ENEMY_SPEED = 1  # Sets the enemy speed
+WINDOW_SCALE = 1  # Sets the window size as a multiple of WIN_SIZE, the game is drawn at WIN_SIZE and scaled up
+FULLSCREEN = False  # Fills the screen, scaled up by the largest whole factor that fits
+FPS = 60  # Sets the game FPS (rendering)
+TICK_RATE = 60  # Sets the simulation steps per second, independent of FPS
+TICK = 1 / TICK_RATE  # Length of one simulation step in seconds
+MAX_FRAME_TIME = 0.25  # Longest frame (in seconds) the simulation will catch up on
+DIRTY_RECTS = False  # Only redraws and updates the parts of the screen that changed
+PLAYER_SPEED = 2  # Sets the player speed (pixels per tick)
+ENEMY_SPEED = 1  # Sets the enemy speed (pixels per tick)
+SOLID_TILES = "B"  # Sets which tilemap characters block movement
+CHUNK_SIZE = 16  # Sets the tilemap chunk size (in tiles) for the pre-rendered terrain
+CHUNK_PRELOAD = 1  # Sets how many chunks around the camera are built ahead of time
+CHUNK_BUILDS_PER_FRAME = 2  # Sets how many chunks may be built ahead in one frame
+SPATIAL_CELL_SIZE = 64  # Sets the spatial hash cell size (in pixels) for entity queries
+FLOW_RADIUS = 24  # Sets how far (in tiles) enemies can find their way to the player
+LOD_ACTIVE_MARGIN = 4  # Sets how far (in tiles) outside the camera enemies are updated every tick
+LOD_THROTTLE_RADIUS = 96  # Sets how far (in tiles) from the player enemies are updated at all
+LOD_INTERVAL = 8  # Sets how many ticks apart enemies outside the active area are updated
+LOD_WAKE_TICKS = 600  # Sets how long (in ticks) far enemies woken by an event keep moving
+LOD_WAKE_RADIUS = 128  # Sets how far (in tiles) the noise of a kill wakes sleeping enemies
+ATTACK_POOL_SIZE = 8  # Sets how many attack sprites are built when a level loads
+FLOW_CACHE_SIZE = 32  # Sets how many flow fields are kept for recently visited tiles
+WALK_FRAME_TIME = 1 / 6  # Sets how long (in seconds) each walking frame is shown
+ATTACK_FRAME_TIME = 1 / 48  # Sets how long (in seconds) each attack frame is shown
+TORCH_FRAME_TIME = 1 / 8  # Sets how long (in seconds) each torch frame is shown
+DARK_LEVELS = False  # Plays levels dark, lit only by the player and torches ("L" on the map)
+SIGHT_RADIUS = 20  # Sets how far (in tiles) the player can see lit tiles
+PLAYER_LIGHT_RADIUS = 5  # Sets how far (in tiles) the player's own light reaches
+TORCH_LIGHT_RADIUS = 7  # Sets how far (in tiles) a torch's light reaches
+LIGHT_LEVELS = 6  # Sets how many steps light fades out in
+FOG_ALPHA = 210  # Sets how dark tiles that were seen before but are out of sight are drawn
+PARTICLE_CAPACITY = 16384  # Sets how many particles each effect's pool holds
+PARTICLE_FADE_STEPS = 8  # Sets how many images a particle fades out over
+PROFILE_HISTORY = 240  # Sets how many frames the profiler keeps for its overlay and trace
+# Asset folders, relative to this file so the game runs from any working directory
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMG_DIR = os.path.join(BASE_DIR, "images", "img", "img")
+
 # Layers (for sprite groups, not for the screen, which is always 0)
 PLAYER_LAYER = 4
 ENEMY_LAYER = 3
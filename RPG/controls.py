@@ -0,0 +1,136 @@
+import json
+
+import pygame
+from config import *
+
+# Player input
+# The game reads input once per simulation tick, as a bit mask of actions, instead of asking
+# the keyboard directly. A tick's input can then be recorded, and a recorded session fed
+# back tick for tick: with the session's seed and level the replay runs exactly like the
+# original, in real time or as fast as possible.
+
+ACTION_LEFT = 1
+ACTION_RIGHT = 2
+ACTION_UP = 4
+ACTION_DOWN = 8
+ACTION_SPRINT = 16
+ACTION_ATTACK = 32  # pressed, not held: set on the first tick after the key went down
+
+# keys that are read while held, and the action they map to
+HELD_KEYS = [
+    (pygame.K_LEFT, ACTION_LEFT),
+    (pygame.K_RIGHT, ACTION_RIGHT),
+    (pygame.K_UP, ACTION_UP),
+    (pygame.K_DOWN, ACTION_DOWN),
+    (pygame.K_LSHIFT, ACTION_SPRINT),
+    (pygame.K_RSHIFT, ACTION_SPRINT),
+]
+
+SESSION_VERSION = 1
+
+
+class Controls:
+    def __init__(self):
+        # Live keyboard input
+        self.state = 0  # actions of the current tick
+        self.pending = 0  # presses since the last tick, they count on the next one
+        self.finished = False  # only a replay runs out of input
+
+    def begin(self, seed, level):
+        # called by Game.new() when a session starts
+        self.state = 0
+        self.pending = 0
+
+    def press(self, action):
+        # records a key press from the event loop for the next tick
+        self.pending |= action
+
+    def read(self):
+        # returns the actions for this tick from the keyboard
+        keys = pygame.key.get_pressed()
+        state = self.pending
+        for key, action in HELD_KEYS:
+            if keys[key]:
+                state |= action
+        self.pending = 0
+        return state
+
+    def tick(self):
+        # samples the input once at the start of every simulation tick
+        self.state = self.read()
+
+    def held(self, action):
+        return self.state & action != 0
+
+
+class Recorder(Controls):
+    def __init__(self):
+        # Keyboard input that also keeps every tick's actions of the session
+        Controls.__init__(self)
+        self.seed = None
+        self.level = None
+        self.ticks = []
+
+    def begin(self, seed, level):
+        Controls.begin(self, seed, level)
+        self.seed = seed
+        # a map file is stored by its path, a text map as its rows
+        self.level = level if isinstance(level, str) else list(level)
+        self.ticks = []
+
+    def tick(self):
+        Controls.tick(self)
+        self.ticks.append(self.state)
+
+    def save(self, path):
+        # writes the session, actions are stored as [actions, ticks] runs since they rarely change
+        runs = []
+        for state in self.ticks:
+            if runs and runs[-1][0] == state:
+                runs[-1][1] += 1
+            else:
+                runs.append([state, 1])
+        with open(path, "w") as file:
+            json.dump(
+                {
+                    "version": SESSION_VERSION,
+                    "seed": self.seed,
+                    "level": self.level,
+                    "ticks": len(self.ticks),
+                    "input": runs,
+                },
+                file,
+            )
+
+
+class Replay(Controls):
+    def __init__(self, path):
+        # Input read back from a recorded session instead of the keyboard
+        Controls.__init__(self)
+        with open(path) as file:
+            session = json.load(file)
+        if session.get("version") != SESSION_VERSION:
+            raise ValueError(f"{path} is not a version {SESSION_VERSION} session")
+        self.seed = session["seed"]
+        self.level = session["level"]
+        self.ticks = []
+        for state, count in session["input"]:
+            self.ticks.extend([state] * count)
+        self.position = 0
+
+    def begin(self, seed, level):
+        Controls.begin(self, seed, level)
+        self.position = 0
+        self.finished = False
+
+    def press(self, action):
+        # the keyboard is ignored while replaying
+        pass
+
+    def read(self):
+        if self.position >= len(self.ticks):
+            self.finished = True
+            return 0
+        state = self.ticks[self.position]
+        self.position += 1
+        return state
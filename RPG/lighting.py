@@ -0,0 +1,243 @@
+import numpy as np
+import pygame
+from config import *
+
+# Field of view and lighting for dark levels
+# What the player can see is worked out by shadowcasting on the tile grid, and how bright
+# each tile is comes from the player's own light and the torches around. Nothing of it is
+# recomputed per frame: only when the player walks onto another tile, a wall changes or a
+# light is added or removed. The darkness is drawn as a layer of cached chunk surfaces over
+# the world, and only chunks whose tiles changed are rebuilt.
+
+# the eight octants as (xx, xy, yx, yy), turning octant coordinates into grid offsets
+OCTANTS = [
+    (1, 0, 0, 1),
+    (0, 1, 1, 0),
+    (0, -1, 1, 0),
+    (-1, 0, 0, 1),
+    (-1, 0, 0, -1),
+    (0, -1, -1, 0),
+    (0, 1, -1, 0),
+    (1, 0, 0, -1),
+]
+
+UNSEEN = 255  # darkness of tiles the player has never seen
+
+
+def shadowcast(grid, col, row, radius):
+    # returns every cell visible from col/row within radius, as cell -> squared distance
+    # recursive shadowcasting: each octant is scanned row by row away from the origin,
+    # walls cut the range of slopes that is still lit for the rows behind them
+    # the solid flags around the origin, read from the grid once as lists (fast to index)
+    size = 2 * radius + 1
+    solid = grid.solid_window(col - radius, row - radius, size, size).tolist()
+    visible = {(col, row): 0}
+    for octant in OCTANTS:
+        cast_octant(solid, col, row, radius, 1, 1.0, 0.0, octant, visible)
+    return visible
+
+
+def cast_octant(solid, col, row, radius, start_row, start, end, octant, visible):
+    # scans one octant from start_row on, between the slopes start and end
+    # solid is the window of solid flags around col/row that shadowcast reads
+    if start < end:
+        return
+    xx, xy, yx, yy = octant
+    radius_squared = radius * radius
+    for distance in range(start_row, radius + 1):
+        blocked = False
+        new_start = start
+        dy = -distance
+        for dx in range(-distance, 1):
+            # slopes of the left and right edges of this cell
+            left = (dx - 0.5) / (dy + 0.5)
+            right = (dx + 0.5) / (dy - 0.5)
+            if start < right:
+                continue
+            if end > left:
+                break
+            offset_col = dx * xx + dy * xy
+            offset_row = dx * yx + dy * yy
+            squared = dx * dx + dy * dy
+            if squared <= radius_squared:
+                visible[(col + offset_col, row + offset_row)] = squared
+            wall = solid[offset_row + radius][offset_col + radius]
+            if blocked:
+                if wall:
+                    new_start = right
+                    continue
+                blocked = False
+                start = new_start
+            elif wall and distance < radius:
+                # the wall shadows the rows behind it, the part before it is scanned on its own
+                blocked = True
+                cast_octant(
+                    solid, col, row, radius, distance + 1, start, left, octant, visible
+                )
+                new_start = right
+        if blocked:
+            return
+
+
+def brightness(squared, radius):
+    # light of a source at a squared distance, full at the source and gone at radius
+    return max(0.0, 1.0 - squared / (radius * radius))
+
+
+class Lighting:
+    def __init__(self, grid):
+        # Per-tile visibility and light, and the darkness layer drawn from them
+        self.grid = grid
+        self.rows = grid.rows
+        self.cols = grid.cols
+        self.chunk_pixels = CHUNK_SIZE * TILESIZE
+
+        self.lights = {}  # (col, row) -> radius of every torch
+        self.light_cache = {}  # (col, row) -> cell -> light, for grid.version
+        self.light_version = grid.version
+
+        self.origin = None  # the player's tile when the view was last computed
+        self.version = -1  # the grid version the view was computed for
+        self.changed = True  # lights were added or removed since then
+
+        # darkness of the tiles the player can see, cell -> 0 (lit) to 255 (black)
+        self.seen = {}
+        # tiles the player has seen before, per chunk so a huge map isn't allocated up front
+        self.explored = {}  # (chunk column, chunk row) -> bool array (rows x cols)
+        self.surfaces = {}  # (chunk column, chunk row) -> darkness surface
+        self.dirty = set()  # chunks whose darkness changed since they were built
+
+    def add_light(self, col, row, radius=TORCH_LIGHT_RADIUS):
+        self.lights[(col, row)] = radius
+        self.changed = True
+
+    def remove_light(self, col, row):
+        if self.lights.pop((col, row), None) is not None:
+            self.light_cache.pop((col, row), None)
+            self.changed = True
+
+    def light_of(self, col, row, radius):
+        # returns the cells a light reaches, cached until a wall changes
+        if self.light_version != self.grid.version:
+            self.light_cache.clear()
+            self.light_version = self.grid.version
+        light = self.light_cache.get((col, row))
+        if light is None:
+            light = {
+                cell: brightness(squared, radius)
+                for cell, squared in shadowcast(self.grid, col, row, radius).items()
+            }
+            self.light_cache[(col, row)] = light
+        return light
+
+    def update(self, player):
+        # recomputes the view if the player walked onto another tile or the level changed
+        origin = (player.rect.centerx // TILESIZE, player.rect.centery // TILESIZE)
+        if origin == self.origin and self.grid.version == self.version and not self.changed:
+            return
+        self.origin = origin
+        self.version = self.grid.version
+        self.changed = False
+
+        col, row = origin
+        sight = shadowcast(self.grid, col, row, SIGHT_RADIUS)
+        # the player's own light, then every torch that lights part of what is in sight
+        light = {}
+        for cell, squared in sight.items():
+            light[cell] = brightness(squared, PLAYER_LIGHT_RADIUS)
+        reach = SIGHT_RADIUS
+        for (light_col, light_row), radius in self.lights.items():
+            if abs(light_col - col) > reach + radius or abs(light_row - row) > reach + radius:
+                continue
+            for cell, level in self.light_of(light_col, light_row, radius).items():
+                if level > light.get(cell, -1.0) and cell in sight:
+                    light[cell] = level
+
+        # visible tiles are the ones in sight with some light, darkness comes in LIGHT_LEVELS steps
+        seen = {}
+        for cell, level in light.items():
+            if level > 0:
+                step = min(int(level * LIGHT_LEVELS), LIGHT_LEVELS - 1)
+                seen[cell] = UNSEEN - UNSEEN * (step + 1) // LIGHT_LEVELS
+
+        # only chunks with tiles that came into or went out of view, or got lighter or darker,
+        # are rebuilt
+        old = self.seen
+        for cell in old.keys() - seen.keys():
+            self.dirty.add((cell[0] // CHUNK_SIZE, cell[1] // CHUNK_SIZE))
+        for cell, darkness in seen.items():
+            if old.get(cell) != darkness:
+                self.dirty.add((cell[0] // CHUNK_SIZE, cell[1] // CHUNK_SIZE))
+                self.explore(cell)
+        self.seen = seen
+
+    def explore(self, cell):
+        # marks a tile as seen, it stays on the map as fog once it is out of sight
+        col, row = cell
+        if not (0 <= col < self.cols and 0 <= row < self.rows):
+            return
+        chunk = (col // CHUNK_SIZE, row // CHUNK_SIZE)
+        explored = self.explored.get(chunk)
+        if explored is None:
+            explored = self.explored[chunk] = np.zeros((CHUNK_SIZE, CHUNK_SIZE), bool)
+        explored[row % CHUNK_SIZE, col % CHUNK_SIZE] = True
+
+    def is_visible(self, rect):
+        # whether the tile under the centre of a rect (world space) is in sight and lit
+        return (rect.centerx // TILESIZE, rect.centery // TILESIZE) in self.seen
+
+    def build_chunk(self, cx, cy):
+        # renders one chunk's darkness: one pixel per tile, scaled up to the tiles
+        first_col = cx * CHUNK_SIZE
+        first_row = cy * CHUNK_SIZE
+        cols = min(CHUNK_SIZE, self.cols - first_col)
+        rows = min(CHUNK_SIZE, self.rows - first_row)
+
+        darkness = np.full((rows, cols), UNSEEN, np.uint8)
+        darkness[self.explored[(cx, cy)][:rows, :cols]] = FOG_ALPHA
+        seen = self.seen
+        for row in range(rows):
+            for col in range(cols):
+                level = seen.get((first_col + col, first_row + row))
+                if level is not None:
+                    darkness[row, col] = level
+
+        small = pygame.Surface((cols, rows), pygame.SRCALPHA)
+        small.fill(BLACK)
+        alpha = pygame.surfarray.pixels_alpha(small)
+        alpha[:] = darkness.T
+        del alpha  # unlocks the surface
+        # nearest neighbour, so the darkness follows the tile grid like the pixel art does
+        self.surfaces[(cx, cy)] = pygame.transform.scale(
+            small, (cols * TILESIZE, rows * TILESIZE)
+        )
+
+    def draw(self, surface, view, chunk_range):
+        # draws the darkness over the chunks chunk_range covers (see TileLayer.chunk_range)
+        first_cx, first_cy, last_cx, last_cy = chunk_range
+        for chunk in self.dirty:
+            self.surfaces.pop(chunk, None)
+        self.dirty.clear()
+
+        for cy in range(first_cy, last_cy + 1):
+            for cx in range(first_cx, last_cx + 1):
+                pos = (cx * self.chunk_pixels - view.x, cy * self.chunk_pixels - view.y)
+                if (cx, cy) not in self.explored:
+                    # never seen, nothing to build
+                    # fill doesn't clip a rect that starts off the surface to the rect, so it
+                    # is clipped first
+                    area = pygame.Rect(pos, (self.chunk_pixels, self.chunk_pixels))
+                    area = area.clip(surface.get_rect())
+                    if area.width and area.height:
+                        surface.fill(BLACK, area)
+                    continue
+                if (cx, cy) not in self.surfaces:
+                    self.build_chunk(cx, cy)
+                surface.blit(self.surfaces[(cx, cy)], pos)
+
+    def evict(self, chunk_range):
+        # drops the darkness surfaces of chunks outside chunk_range, they are built again if needed
+        first_cx, first_cy, last_cx, last_cy = chunk_range
+        for cx, cy in list(self.surfaces):
+            if not (first_cx <= cx <= last_cx and first_cy <= cy <= last_cy):
+                del self.surfaces[(cx, cy)]
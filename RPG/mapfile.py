@@ -0,0 +1,230 @@
+import json
+import os
+import struct
+import sys
+import xml.etree.ElementTree as ElementTree
+
+import numpy as np
+from config import *
+
+# Map files
+# A map is a grid of tile ids plus an object layer (where the player and enemies start).
+# Text maps (lists of strings, like the tilemap in config.py) are turned into the same
+# TileMap in memory. Map files store the grid as raw uint8/uint16 after a small header:
+#   magic, header length, JSON header, tile grid (rows x cols, row by row)
+# and are memory-mapped, so opening even a huge map reads nothing but the header. The
+# operating system pages parts of the grid in when the chunks around the camera need them.
+#
+#   python mapfile.py import-text out.rpgmap [map.txt]    text map (default: config tilemap)
+#   python mapfile.py add-tileset map.rpgmap tileset.tsx  adds a Tiled tileset to a map file
+#   python mapfile.py generate out.rpgmap COLS ROWS [ENEMIES] [SEED]
+#
+# Tile ids below len(palette) are the text map characters, a Tiled tileset's tiles follow
+# from its firstid on, like Tiled's global tile ids. A character added after a tileset gets
+# an id after the tileset's tiles, the palette holds None for the ids the tileset uses.
+
+MAP_MAGIC = b"RPGMAP1\0"
+
+# ids of the text map characters, "P", "E" and "L" (torch) go to the object layer and leave
+# ground behind
+PALETTE = [" ", "B"]
+OBJECT_TILES = "PEL"
+
+
+class TileMap:
+    def __init__(self, tiles, palette=PALETTE, tilesets=None, objects=None):
+        self.tiles = tiles  # 2D array of tile ids (rows x cols), may be memory-mapped
+        self.rows, self.cols = tiles.shape
+        self.palette = list(palette)  # tile id -> text map character
+        self.tilesets = tilesets or []  # Tiled tilesets, as dicts (see load_tileset)
+        self.objects = objects or []  # [kind, col, row], kind is a text map character
+
+    def tile_count(self):
+        # the number of tile ids in use, palette first, then every tileset
+        count = len(self.palette)
+        for tileset in self.tilesets:
+            count = max(count, tileset["firstid"] + tileset["count"])
+        return count
+
+    def solid_ids(self):
+        # lookup table: tile id -> blocks movement
+        solid = np.zeros(max(self.tile_count(), 256), bool)
+        for tile_id, char in enumerate(self.palette):
+            solid[tile_id] = char is not None and char in SOLID_TILES
+        return solid
+
+    def char_id(self, char):
+        # returns the id of a text map character, adding it to the palette if it's new
+        # a new character gets the first id no tileset uses, the palette skips the tilesets'
+        # ids with None so a palette index stays a tile id
+        if char not in self.palette:
+            tile_id = self.tile_count()
+            if tile_id > np.iinfo(self.tiles.dtype).max:
+                raise ValueError(f"no tile id left for {char!r} in a {self.tiles.dtype} map")
+            self.palette.extend([None] * (tile_id - len(self.palette)))
+            self.palette.append(char)
+        return self.palette.index(char)
+
+
+def from_text(lines):
+    # builds a map from a text map, short rows are padded with ground
+    rows = len(lines)
+    cols = max(len(line) for line in lines)
+    tiles = np.zeros((rows, cols), np.uint8)
+    tilemap = TileMap(tiles)
+    for row, line in enumerate(lines):
+        for col, char in enumerate(line):
+            if char in OBJECT_TILES:
+                tilemap.objects.append([char, col, row])
+            elif char != " ":
+                tiles[row, col] = tilemap.char_id(char)
+    return tilemap
+
+
+def load_map(level):
+    # returns the TileMap for a level: a text map, a path to a map file, or a TileMap
+    if isinstance(level, TileMap):
+        return level
+    if isinstance(level, str):
+        return open_map(level)
+    return from_text(level)
+
+
+def open_map(path):
+    # memory-maps a map file, copy-on-write so tiles can change in game without touching it
+    with open(path, "rb") as file:
+        if file.read(8) != MAP_MAGIC:
+            raise ValueError(f"{path} is not a map file")
+        (header_size,) = struct.unpack("<I", file.read(4))
+        header = json.loads(file.read(header_size).decode("utf-8"))
+    tiles = np.memmap(
+        path,
+        dtype=np.dtype(header["dtype"]).newbyteorder("<"),
+        mode="c",
+        offset=header["data"],
+        shape=(header["rows"], header["cols"]),
+    )
+    # a plain array view of the mapping indexes faster than the memmap subclass
+    tiles = tiles.view(np.ndarray)
+    return TileMap(tiles, header["palette"], header["tilesets"], header["objects"])
+
+
+def save_map(tilemap, path):
+    # writes a map file, the grid uses one byte per tile unless there are more than 256 ids
+    dtype = "uint8" if tilemap.tile_count() <= 256 else "uint16"
+    header = {
+        "cols": tilemap.cols,
+        "rows": tilemap.rows,
+        "dtype": dtype,
+        "palette": tilemap.palette,
+        "tilesets": tilemap.tilesets,
+        "objects": tilemap.objects,
+        "data": 0,
+    }
+    # the grid starts on an 8 byte boundary after the header, the header says where
+    data = 0
+    while True:
+        encoded = json.dumps(header).encode("utf-8")
+        start = -(-(12 + len(encoded)) // 8) * 8
+        if start == data:
+            break
+        header["data"] = data = start
+    with open(path, "wb") as file:
+        file.write(MAP_MAGIC)
+        file.write(struct.pack("<I", len(encoded)))
+        file.write(encoded)
+        file.write(b"\0" * (data - 12 - len(encoded)))
+        # writes the grid a band of rows at a time, so saving doesn't copy a huge map
+        for row in range(0, tilemap.rows, 256):
+            band = np.asarray(tilemap.tiles[row : row + 256], np.dtype(dtype).newbyteorder("<"))
+            file.write(band.tobytes())
+
+
+def load_tileset(path):
+    # reads a Tiled tileset (.tsx), its image path is stored relative to IMG_DIR
+    root = ElementTree.parse(path).getroot()
+    image = root.find("image")
+    tileset = {
+        "name": root.get("name"),
+        "tilewidth": int(root.get("tilewidth")),
+        "tileheight": int(root.get("tileheight")),
+        "count": int(root.get("tilecount", 0)),
+        "columns": int(root.get("columns", 0)),
+        "image": None,
+    }
+    if image is not None:
+        image_path = os.path.join(os.path.dirname(os.path.abspath(path)), image.get("source"))
+        tileset["image"] = os.path.relpath(image_path, IMG_DIR).replace(os.sep, "/")
+    return tileset
+
+
+def add_tileset(tilemap, path):
+    # adds a Tiled tileset to a map, its tiles get the ids after every id in use
+    tileset = load_tileset(path)
+    if not tileset["count"] or tileset["image"] is None:
+        raise ValueError(f"{path} has no tiles")
+    if (tileset["tilewidth"], tileset["tileheight"]) != (TILESIZE, TILESIZE):
+        raise ValueError(f"{path} has {tileset['tilewidth']}px tiles, the game uses {TILESIZE}px")
+    tileset["firstid"] = tilemap.tile_count()
+    tilemap.tilesets.append(tileset)
+    return tileset
+
+
+def generate_map(cols, rows, enemies, rng, walls=0.04):
+    # builds a walled map with random wall tiles, the player in the middle and enemies scattered
+    # rng is a NumPy generator, the whole map is made with array operations
+    wall = PALETTE.index("B")
+    tiles = np.where(rng.random((rows, cols)) < walls, wall, 0).astype(np.uint8)
+    tiles[[0, -1], :] = wall
+    tiles[:, [0, -1]] = wall
+
+    # keeps the area around the player free so it doesn't start boxed in or touching an enemy
+    player_col, player_row = cols // 2, rows // 2
+    tiles[player_row - 3 : player_row + 4, player_col - 3 : player_col + 4] = 0
+    objects = [["P", player_col, player_row]]
+
+    free_rows, free_cols = np.nonzero(tiles == 0)
+    far = (np.abs(free_cols - player_col) > 3) | (np.abs(free_rows - player_row) > 3)
+    free_rows, free_cols = free_rows[far], free_cols[far]
+    picks = rng.choice(len(free_rows), min(enemies, len(free_rows)), replace=False)
+    for pick in sorted(picks.tolist()):
+        objects.append(["E", int(free_cols[pick]), int(free_rows[pick])])
+    return TileMap(tiles, objects=objects)
+
+
+def main(args):
+    if args[:1] == ["import-text"] and len(args) in (2, 3):
+        if len(args) == 3:
+            with open(args[2]) as file:
+                lines = file.read().splitlines()
+        else:
+            lines = tilemap
+        save_map(from_text(lines), args[1])
+    elif args[:1] == ["add-tileset"] and len(args) == 3:
+        # the map is read into memory first, it is written over
+        loaded = open_map(args[1])
+        loaded.tiles = np.array(loaded.tiles)
+        try:
+            tileset = add_tileset(loaded, args[2])
+        except ValueError as error:
+            print(error)
+            return 1
+        save_map(loaded, args[1])
+        print(f"tileset {tileset['name']} has ids {tileset['firstid']} and up")
+    elif args[:1] == ["generate"] and 4 <= len(args) <= 6:
+        cols, rows = int(args[2]), int(args[3])
+        enemies = int(args[4]) if len(args) > 4 else 0
+        rng = np.random.default_rng(int(args[5]) if len(args) > 5 else None)
+        save_map(generate_map(cols, rows, enemies, rng), args[1])
+    else:
+        print(
+            "usage: python mapfile.py import-text out.rpgmap [map.txt]\n"
+            "       python mapfile.py add-tileset map.rpgmap tileset.tsx\n"
+            "       python mapfile.py generate out.rpgmap COLS ROWS [ENEMIES] [SEED]"
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
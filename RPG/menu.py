@@ -0,0 +1,66 @@
+import pygame
+from config import *
+
+
+class Menu:
+    def __init__(self, game, background):
+        # Event-driven menu screen
+        # A menu is static, so instead of redrawing it every frame it sleeps on the event
+        # queue and only wakes up for input. The screen is drawn once when the menu opens,
+        # then again only when the window needs it (exposed, restored) or an item changes.
+        # A menu left open uses next to no CPU.
+        self.game = game
+        self.background = background
+        self.items = []  # (surface, rect), drawn in order over the background
+        self.buttons = []  # (button, action)
+        self.redraw = True
+
+    def add_text(self, surface, rect):
+        self.items.append((surface, rect))
+
+    def add_button(self, button, action):
+        # action is returned by run() when the button is clicked
+        self.items.append((button.image, button.rect))
+        self.buttons.append((button, action))
+
+    def draw(self):
+        screen = self.game.screen
+        screen.blit(self.background, (0, 0))
+        for surface, rect in self.items:
+            screen.blit(surface, rect)
+        self.game.present()
+        self.redraw = False
+
+    def handle(self, event):
+        # returns the action of a clicked button, None for anything else
+        if event.type == pygame.WINDOWEXPOSED or event.type == pygame.WINDOWRESTORED:
+            self.game.invalidate()
+            self.redraw = True
+            return None
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            # buttons are laid out on the game's screen, which may be scaled up in the window
+            event = pygame.event.Event(
+                event.type, button=event.button, pos=self.game.to_screen(event.pos)
+            )
+        for button, action in self.buttons:
+            if button.is_clicked(event):
+                return action
+        return None
+
+    def run(self):
+        # shows the menu until a button is clicked, returns its action
+        # returns None if the window is closed, game.running is then False
+        self.redraw = True
+        # clicks and key presses from before the menu opened don't count
+        pygame.event.clear((pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.KEYDOWN))
+        while True:
+            if self.redraw:
+                self.draw()
+            # blocks until there is an event, nothing runs while the menu is idle
+            event = pygame.event.wait()
+            if event.type == pygame.QUIT:
+                self.game.running = False
+                return None
+            action = self.handle(event)
+            if action is not None:
+                return action
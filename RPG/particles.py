@@ -0,0 +1,151 @@
+import numpy as np
+import pygame
+from config import *
+
+# Surface.fblits (pygame-ce) is the fastest batch blit, pygame has blits without the return list
+HAS_FBLITS = hasattr(pygame.Surface, "fblits")
+
+
+def fade_images(color, radius, steps=PARTICLE_FADE_STEPS):
+    # returns a particle's images over its life, a dot that shrinks and fades out
+    images = []
+    for step in range(steps):
+        left = 1 - step / steps
+        size = max(1, round(radius * left))
+        image = pygame.Surface((size * 2, size * 2), pygame.SRCALPHA)
+        pygame.draw.circle(image, (*color, round(255 * left)), (size, size), size)
+        images.append(image.convert_alpha())
+    return images
+
+
+class Emitter:
+    def __init__(
+        self,
+        images,
+        capacity,
+        layer,
+        speed=(30, 90),
+        life=(0.2, 0.5),
+        gravity=0.0,
+        drag=0.0,
+    ):
+        # Array-backed particle pool
+        # Every particle is a slot of a set of preallocated NumPy arrays, like the enemy swarm;
+        # update() moves and ages all of them at once and draw() blits all of them in one
+        # batch call (Surface.fblits, or Surface.blits on pygame). Nothing is built per
+        # particle, so tens of thousands stay cheap.
+        # A particle shows images[0] when it is born and the last image just before it dies.
+        self.images = np.empty(len(images), object)  # so a frame index array picks images
+        self.images[:] = images
+        self.offsets = np.array([image.get_width() // 2 for image in images], np.float32)
+        self.layer = layer  # drawn over the sprites of this layer and under those above it
+        self.speed = speed  # (lowest, highest) launch speed, in pixels per second
+        self.life = life  # (shortest, longest) lifetime, in seconds
+        self.gravity = gravity  # pixels per second squared, down the screen
+        self.drag = drag  # share of the velocity lost per second
+
+        self.count = 0
+        self.capacity = capacity  # the pool never grows, emitting into a full one drops particles
+        self.x = np.zeros(capacity, np.float32)
+        self.y = np.zeros(capacity, np.float32)
+        self.vx = np.zeros(capacity, np.float32)
+        self.vy = np.zeros(capacity, np.float32)
+        self.age = np.zeros(capacity, np.float32)
+        self.lifetime = np.ones(capacity, np.float32)
+
+        # particles are only for show, so they have their own generator and don't use up
+        # the random numbers a seeded session plays with
+        self.rng = np.random.default_rng()
+        self.dropped = 0  # particles that didn't fit in the pool
+
+    def emit(self, x, y, count, angle=0.0, spread=np.pi):
+        # starts count particles at world position x/y, flying off at angle (radians,
+        # 0 is right, pi/2 is down the screen) give or take spread
+        fits = min(count, self.capacity - self.count)
+        self.dropped += count - fits
+        count = fits
+        if count <= 0:
+            return
+        new = slice(self.count, self.count + count)
+        rng = self.rng
+        direction = angle + rng.uniform(-spread, spread, count)
+        speed = rng.uniform(self.speed[0], self.speed[1], count)
+        self.x[new] = x
+        self.y[new] = y
+        self.vx[new] = np.cos(direction) * speed
+        self.vy[new] = np.sin(direction) * speed
+        self.age[new] = 0
+        self.lifetime[new] = rng.uniform(self.life[0], self.life[1], count)
+        self.count += count
+
+    def update(self, dt):
+        # moves and ages every particle by dt seconds, then packs the live ones to the front
+        n = self.count
+        if n == 0:
+            return
+        age = self.age[:n]
+        age += dt
+        alive = age < self.lifetime[:n]
+        vx = self.vx[:n]
+        vy = self.vy[:n]
+        if self.drag:
+            damping = max(0.0, 1 - self.drag * dt)
+            vx *= damping
+            vy *= damping
+        if self.gravity:
+            vy += self.gravity * dt
+        self.x[:n] += vx * dt
+        self.y[:n] += vy * dt
+
+        if not alive.all():
+            live = int(np.count_nonzero(alive))
+            for array in [self.x, self.y, self.vx, self.vy, self.age, self.lifetime]:
+                array[:live] = array[:n][alive]
+            self.count = live
+
+    def draw(self, surface, view):
+        # blits the particles inside the view (world space) in one batch, returns how many
+        n = self.count
+        if n == 0:
+            return 0
+        frame = (self.age[:n] / self.lifetime[:n] * len(self.images)).astype(np.intp)
+        np.minimum(frame, len(self.images) - 1, out=frame)
+        offset = self.offsets[frame]
+        x = (self.x[:n] - offset - view.x).astype(np.int32)
+        y = (self.y[:n] - offset - view.y).astype(np.int32)
+        # particles off screen are culled before the blit list is built
+        inside = (x > -TILESIZE) & (x < view.width) & (y > -TILESIZE) & (y < view.height)
+        if not inside.all():
+            frame, x, y = frame[inside], x[inside], y[inside]
+        batch = zip(self.images[frame].tolist(), zip(x.tolist(), y.tolist()))
+        if HAS_FBLITS:
+            surface.fblits(batch)
+        else:
+            surface.blits(batch, doreturn=False)
+        return len(frame)
+
+
+class ParticleSystem:
+    def __init__(self):
+        # Named emitters, updated once per tick and drawn by the renderer in layer order
+        self.emitters = {}
+        self.by_layer = []  # (layer, emitter), sorted by layer
+
+    def add(self, name, emitter):
+        self.emitters[name] = emitter
+        self.by_layer = sorted(
+            ((emitter.layer, emitter) for emitter in self.emitters.values()),
+            key=lambda entry: entry[0],
+        )
+        return emitter
+
+    def emit(self, name, x, y, count, angle=0.0, spread=np.pi):
+        self.emitters[name].emit(x, y, count, angle, spread)
+
+    def update(self, dt):
+        for emitter in self.emitters.values():
+            emitter.update(dt)
+
+    def count(self):
+        # the number of live particles
+        return sum(emitter.count for emitter in self.emitters.values())
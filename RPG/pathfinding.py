@@ -0,0 +1,137 @@
+from collections import OrderedDict, deque
+
+import numpy as np
+from config import *
+
+# Direction codes in a flow field match the enemy facing codes in swarm.py:
+# 0 walks down the screen, 1 up the screen, 2 left, 3 right, -1 means no direction
+NO_DIRECTION = -1
+
+
+class FlowField:
+    def __init__(self, grid, target_col, target_row, radius):
+        # Flow field towards one target tile
+        # A breadth-first search from the target gives every reachable tile within radius
+        # its walking distance to the target, and each tile points at the neighbour that
+        # is one step closer. Any number of enemies can then steer with one lookup each.
+        self.target = (target_col, target_row)
+        self.size = radius * 2 + 1
+        self.col0 = target_col - radius  # map column of the field's left edge
+        self.row0 = target_row - radius  # map row of the field's top edge
+
+        blocked = self.window(grid)
+        self.distance = self.search(blocked, radius, radius)
+        self.direction = self.directions(self.distance)
+
+    def window(self, grid):
+        # copies the solid flags of the field's area out of the grid, outside the map is solid
+        return grid.solid_window(self.col0, self.row0, self.size, self.size)
+
+    def search(self, blocked, start_col, start_row):
+        # breadth-first search over the window, returns distances (-1 unreachable)
+        # the window gets a solid border and is flattened, so a cell's neighbours are plain
+        # index offsets and the loop needs no bounds checks
+        size = self.size
+        stride = size + 2
+        padded = np.ones((stride, stride), bool)
+        padded[1:-1, 1:-1] = blocked
+        # unreachable cells and walls both stay -1, walls are simply never queued
+        open_cells = (~padded).ravel().tolist()
+        distance = [-1] * (stride * stride)
+        start = (start_row + 1) * stride + start_col + 1
+        if open_cells[start]:
+            distance[start] = 0
+            open_cells[start] = False
+            queue = deque([start])
+            offsets = (-stride, stride, -1, 1)
+            while queue:
+                cell = queue.popleft()
+                step = distance[cell] + 1
+                for offset in offsets:
+                    neighbour = cell + offset
+                    if open_cells[neighbour]:
+                        open_cells[neighbour] = False
+                        distance[neighbour] = step
+                        queue.append(neighbour)
+        return np.array(distance, np.int32).reshape(stride, stride)[1:-1, 1:-1]
+
+    def directions(self, distance):
+        # points every reachable tile at its closest neighbour, all tiles at once
+        far = np.iinfo(np.int32).max
+        padded = np.full((self.size + 2, self.size + 2), far, np.int32)
+        padded[1:-1, 1:-1] = np.where(distance < 0, far, distance)
+        neighbours = np.stack(
+            [
+                padded[2:, 1:-1],  # below, code 0
+                padded[:-2, 1:-1],  # above, code 1
+                padded[1:-1, :-2],  # left, code 2
+                padded[1:-1, 2:],  # right, code 3
+            ]
+        )
+        best = neighbours.argmin(axis=0)
+        closer = neighbours.min(axis=0) < distance
+        return np.where((distance > 0) & closer, best, NO_DIRECTION).astype(np.int8)
+
+    def direction_at(self, cols, rows):
+        # returns the direction code for arrays of map columns and rows
+        local_cols = cols - self.col0
+        local_rows = rows - self.row0
+        inside = (
+            (local_cols >= 0)
+            & (local_cols < self.size)
+            & (local_rows >= 0)
+            & (local_rows < self.size)
+        )
+        result = np.full(len(cols), NO_DIRECTION, np.int8)
+        result[inside] = self.direction[local_rows[inside], local_cols[inside]]
+        return result
+
+
+class Pathfinder:
+    def __init__(self, grid, radius=FLOW_RADIUS, cache_size=FLOW_CACHE_SIZE):
+        # Pathfinding service
+        # Keeps the flow field towards the tile the target stands on. The field is only
+        # rebuilt when the target moves to another tile, and recent fields are cached per
+        # target tile (least recently used are evicted) so walking back and forth is free.
+        # A field for a new tile is a full search, not a patch of the last one: the window
+        # moves with the target and every distance in it changes by one, so patching
+        # would touch as many cells as searching does.
+        self.grid = grid
+        self.radius = radius
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # (col, row) -> FlowField
+        self.grid_version = grid.version
+        self.field = None  # field towards the current target
+        self.hits = 0
+        self.misses = 0
+
+    def field_for(self, col, row):
+        # returns the flow field towards a tile, from the cache if possible
+        if self.grid.version != self.grid_version:
+            # walls changed, every cached field is out of date
+            self.cache.clear()
+            self.grid_version = self.grid.version
+
+        key = (col, row)
+        field = self.cache.get(key)
+        if field is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return field
+
+        self.misses += 1
+        field = self.cache[key] = FlowField(self.grid, col, row, self.radius)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return field
+
+    def update(self, target):
+        # follows the target sprite, switching fields when it crosses into another tile
+        col = target.rect.centerx // TILESIZE
+        row = target.rect.centery // TILESIZE
+        if (
+            self.field is None
+            or self.field.target != (col, row)
+            or self.grid.version != self.grid_version
+        ):
+            self.field = self.field_for(col, row)
@@ -0,0 +1,53 @@
+import pygame
+from config import *
+
+
+class SpritePool:
+    def __init__(self, factory, size=0):
+        # Object pool for short-lived sprites (attacks, effects)
+        # Sprites are built up front by factory() and reused: acquire() resets a free one
+        # and puts it back in its groups, release() takes it out of its groups and keeps it.
+        # A sprite in the pool needs a reset(*args) method that sets it up and joins its groups.
+        self.factory = factory
+        self.free = [factory() for _ in range(size)]
+        self.size = size  # sprites built so far
+
+        # metrics, to size the pool for a scene
+        self.hits = 0  # acquires served from the pool
+        self.misses = 0  # acquires that had to build a new sprite
+        self.in_use = 0
+        self.peak = 0  # most sprites in use at once
+
+    def acquire(self, *args):
+        # returns a reset sprite, building a new one only if the pool is empty
+        if self.free:
+            sprite = self.free.pop()
+            self.hits += 1
+        else:
+            sprite = self.factory()
+            self.size += 1
+            self.misses += 1
+        sprite.reset(*args)
+        self.in_use += 1
+        self.peak = max(self.peak, self.in_use)
+        return sprite
+
+    def release(self, sprite):
+        # takes a sprite out of its groups and returns it to the pool
+        if not sprite.alive():
+            return
+        pygame.sprite.Sprite.kill(sprite)
+        self.free.append(sprite)
+        self.in_use -= 1
+
+    def stats(self):
+        # pool metrics as a dict
+        acquired = self.hits + self.misses
+        return {
+            "size": self.size,
+            "in_use": self.in_use,
+            "peak": self.peak,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / acquired if acquired else 1.0,
+        }
@@ -0,0 +1,218 @@
+import json
+import os
+import time
+from collections import deque
+
+import pygame
+from assets import load_font
+from config import *
+
+# Frame profiler
+# Times the sections of every frame (waiting, events, each step of update, draw, present) and the
+# update() of every sprite class, counts blits and collision queries, and keeps the last
+# PROFILE_HISTORY frames for the overlay and for exporting.
+#
+#   F3 toggles the overlay (and profiling with it)
+#   F4 writes the kept frames to profile_trace.json, open it in chrome://tracing or Perfetto
+#
+# While disabled every hook returns straight away, so it costs one attribute check per call.
+
+TRACE_FILE = os.path.join(BASE_DIR, "profile_trace.json")
+
+HISTOGRAM_BUCKET_MS = 2  # width of a frame-time histogram bucket
+HISTOGRAM_BUCKETS = 16  # the last bucket also holds every longer frame
+OVERLAY_FONT_SIZE = 14
+OVERLAY_WIDTH = 260
+
+
+class Frame:
+    def __init__(self, start):
+        # one profiled frame: when it started, how long it took and what happened in it
+        self.start = start
+        self.duration = 0.0  # ms
+        self.sections = {}  # section name -> ms, summed over the frame
+        self.sprites = {}  # sprite class name -> ms spent in update()
+        self.counters = {}  # counter name -> count
+        self.spans = []  # (name, start, end) in perf_counter seconds, for the trace
+
+
+class Profiler:
+    def __init__(self, game, history=PROFILE_HISTORY):
+        self.game = game
+        self.enabled = False
+        self.frames = deque(maxlen=history)  # finished frames, oldest first
+        self.frame = None  # frame being recorded
+        self.last = 0.0  # end of the last section, the next one starts here
+        self.queries = 0  # spatial hash queries when the frame started
+        self.overlay_rect = pygame.Rect(0, 0, OVERLAY_WIDTH, 0)
+
+    def toggle(self):
+        # switches profiling and the overlay on or off
+        self.enabled = not self.enabled
+        self.frames.clear()
+        self.frame = None
+        self.overlay_rect.height = 0
+        # the overlay covered part of the screen, or is about to
+        self.game.renderer.invalidate()
+
+    def begin_frame(self):
+        # call at the top of every frame, finishes the previous one
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.frame is not None:
+            self.end_frame(now)
+        self.frame = Frame(now)
+        self.last = now
+        self.queries = self.game.entities.queries
+
+    def end_frame(self, now):
+        frame = self.frame
+        frame.duration = (now - frame.start) * 1000
+        stats = self.game.renderer.stats
+        frame.counters["blits"] = stats["sprites_drawn"] + stats["chunks_drawn"]
+        frame.counters["sprites_culled"] = stats["sprites_culled"]
+        frame.counters["collision_queries"] = self.game.entities.queries - self.queries
+        frame.counters["sprites"] = len(self.game.all_sprites)
+        frame.counters["particles"] = self.game.particles.count()
+        # enemies in each level of detail band, as of the last tick
+        for band, count in self.game.swarm.lod_counts.items():
+            frame.counters["enemies_" + band] = count
+        self.frames.append(frame)
+
+    def mark(self, name):
+        # ends the section that started at the last mark, and records it under name
+        if not self.enabled or self.frame is None:
+            return
+        now = time.perf_counter()
+        sections = self.frame.sections
+        sections[name] = sections.get(name, 0.0) + (now - self.last) * 1000
+        self.frame.spans.append((name, self.last, now))
+        self.last = now
+
+    def update_sprites(self, group):
+        # does group.update() while timing every sprite's update() by its class
+        if self.frame is None:
+            group.update()
+            return
+        perf_counter = time.perf_counter
+        times = self.frame.sprites
+        for sprite in group.sprites():
+            start = perf_counter()
+            sprite.update()
+            name = type(sprite).__name__
+            times[name] = times.get(name, 0.0) + (perf_counter() - start) * 1000
+
+    def summary(self):
+        # returns the mean and p95 of every section and the mean of every counter, in ms
+        frames = list(self.frames)
+        result = {"frames": len(frames), "sections": {}, "sprites": {}, "counters": {}}
+        if not frames:
+            return result
+        durations = sorted(frame.duration for frame in frames)
+        result["frame"] = {
+            "mean": sum(durations) / len(durations),
+            "p95": durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+        }
+        for key in ["sections", "sprites", "counters"]:
+            totals = {}
+            for frame in frames:
+                for name, value in getattr(frame, key).items():
+                    totals[name] = totals.get(name, 0) + value
+            result[key] = {name: total / len(frames) for name, total in totals.items()}
+        return result
+
+    def histogram(self):
+        # counts the kept frames by frame time
+        counts = [0] * HISTOGRAM_BUCKETS
+        for frame in self.frames:
+            bucket = int(frame.duration // HISTOGRAM_BUCKET_MS)
+            counts[min(bucket, HISTOGRAM_BUCKETS - 1)] += 1
+        return counts
+
+    def draw(self, surface):
+        # draws the overlay in the top left corner, returns the area it covers
+        if not self.enabled:
+            return None
+        font = load_font("fonts/Roboto/Roboto-Medium.ttf", OVERLAY_FONT_SIZE)
+        summary = self.summary()
+        lines = []
+        if summary["frames"]:
+            frame = summary["frame"]
+            lines.append(f"frame {frame['mean']:.2f} ms  p95 {frame['p95']:.2f} ms")
+            for name, ms in summary["sections"].items():
+                lines.append(f"  {name:<14} {ms:.3f}")
+            for name, ms in summary["sprites"].items():
+                lines.append(f"  {name}.update {ms:.3f}")
+            for name, count in summary["counters"].items():
+                lines.append(f"{name} {count:.0f}")
+        else:
+            lines.append("profiling...")
+
+        line_height = font.get_linesize()
+        bar_height = 40
+        rect = self.overlay_rect
+        # never shrinks, so a dirty-rect renderer is never left with a stale strip below it
+        rect.height = max(rect.height, line_height * len(lines) + bar_height + 12)
+        # opaque, so in dirty-rect mode whatever the renderer drew below is fully covered
+        surface.fill(DARKGREY, rect)
+        y = 4
+        for line in lines:
+            surface.blit(font.render(line, True, WHITE), (6, y))
+            y += line_height
+
+        # frame-time histogram, the bucket that holds the frame budget is drawn in yellow
+        counts = self.histogram()
+        tallest = max(counts) or 1
+        bar_width = (OVERLAY_WIDTH - 12) // HISTOGRAM_BUCKETS
+        budget = int(1000 / FPS // HISTOGRAM_BUCKET_MS)
+        for bucket, count in enumerate(counts):
+            height = bar_height * count // tallest
+            colour = GREEN if bucket < budget else YELLOW if bucket == budget else RED
+            surface.fill(
+                colour,
+                (6 + bucket * bar_width, y + 4 + bar_height - height, bar_width - 1, height),
+            )
+        return rect
+
+    def export(self, path=TRACE_FILE):
+        # writes the kept frames as a Chrome trace, with the summary as metadata
+        frames = list(self.frames)
+        if not frames:
+            return None
+        origin = frames[0].start
+        events = []
+        for frame in frames:
+            events.append(
+                {
+                    "name": "frame",
+                    "ph": "X",
+                    "ts": (frame.start - origin) * 1e6,
+                    "dur": frame.duration * 1000,
+                    "pid": 0,
+                    "tid": 0,
+                    "args": dict(frame.counters),
+                }
+            )
+            for name, start, end in frame.spans:
+                event = {
+                    "name": name,
+                    "ph": "X",
+                    "ts": (start - origin) * 1e6,
+                    "dur": (end - start) * 1e6,
+                    "pid": 0,
+                    "tid": 0,
+                }
+                if name == "update/sprites":
+                    event["args"] = dict(frame.sprites)
+                events.append(event)
+        with open(path, "w") as file:
+            json.dump(
+                {
+                    "traceEvents": events,
+                    "displayTimeUnit": "ms",
+                    "otherData": self.summary(),
+                },
+                file,
+            )
+        return path
@@ -0,0 +1,263 @@
+import pygame
+from config import *
+
+
+class Renderer:
+    def __init__(self, game):
+        # World renderer
+        # Only the terrain chunks and sprites that intersect the camera are drawn;
+        # sprites are found through the spatial hash instead of walking all_sprites
+        self.game = game
+
+        # per-frame counts of what was drawn and what was culled
+        self.stats = {
+            "sprites_drawn": 0,
+            "sprites_culled": 0,
+            "chunks_drawn": 0,
+            "chunks_culled": 0,
+            "particles_drawn": 0,
+        }
+
+    def visible_sprites(self, view):
+        # returns the sprites overlapping the view, sorted for drawing
+        # layer first, then lower sprites in front of higher ones on the same layer, then
+        # left to right and in spawn order, so overlapping sprites never swap places
+        entities = self.game.entities
+        visible = entities.query_rect(view)
+        lighting = self.game.lighting
+        if lighting:
+            # on dark levels enemies are only shown on tiles the player can see
+            visible = [
+                sprite
+                for sprite in visible
+                if sprite._layer != ENEMY_LAYER or lighting.is_visible(sprite.rect)
+            ]
+        spawn_order = entities.spawn_order
+        visible.sort(
+            key=lambda sprite: (
+                sprite._layer,
+                sprite.rect.bottom,
+                sprite.rect.x,
+                spawn_order[sprite],
+            )
+        )
+        return visible
+
+    def screen_rect(self, sprite, view, alpha):
+        # returns where a sprite is drawn on screen
+        # the position is interpolated between the last two simulation ticks
+        rect = sprite.rect
+        prev_x, prev_y = sprite.prev_pos
+        return rect.move(
+            round((prev_x - rect.x) * (1 - alpha)) - view.x,
+            round((prev_y - rect.y) * (1 - alpha)) - view.y,
+        )
+
+    def draw(self, surface, alpha=1.0):
+        # draws the visible part of the world onto surface
+        # alpha is how far the frame is between the previous and the current tick
+        view = self.game.camera.view(alpha)
+        surface.fill(BLACK)  # fills screen with black
+
+        # terrain chunks, only those inside the view
+        chunks_drawn, chunks_culled = self.game.terrain.draw(surface, view)
+
+        # sprites, only those inside the view
+        # every particle emitter is drawn in one batch after the sprites of its layer
+        visible = self.visible_sprites(view)
+        emitters = self.game.particles.by_layer
+        drawn_emitters = 0
+        particles_drawn = 0
+        for sprite in visible:
+            while (
+                drawn_emitters < len(emitters)
+                and emitters[drawn_emitters][0] < sprite._layer
+            ):
+                particles_drawn += emitters[drawn_emitters][1].draw(surface, view)
+                drawn_emitters += 1
+            surface.blit(sprite.image, self.screen_rect(sprite, view, alpha))
+        for layer, emitter in emitters[drawn_emitters:]:
+            particles_drawn += emitter.draw(surface, view)
+
+        # the darkness of dark levels goes over everything in the world
+        lighting = self.game.lighting
+        if lighting:
+            terrain = self.game.terrain
+            lighting.draw(surface, view, terrain.chunk_range(view))
+            lighting.evict(terrain.chunk_range(view, CHUNK_PRELOAD + 1))
+
+        self.stats["chunks_drawn"] = chunks_drawn
+        self.stats["chunks_culled"] = chunks_culled
+        self.stats["sprites_drawn"] = len(visible)
+        self.stats["sprites_culled"] = len(self.game.all_sprites) - len(visible)
+        self.stats["particles_drawn"] = particles_drawn
+
+        # the whole screen changed
+        return [surface.get_rect()]
+
+    def invalidate(self):
+        # the full renderer redraws everything every frame anyway
+        pass
+
+
+def merge_rects(rects):
+    # merges overlapping rects so each screen area is only redrawn once
+    merged = []
+    for rect in rects:
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect = rect.union(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
+
+class DirtyRenderer(Renderer):
+    def __init__(self, game):
+        # Dirty-rectangle renderer
+        # Remembers where every sprite was drawn last frame and only redraws the areas
+        # where a sprite moved, changed frame, appeared or disappeared.
+        # Those areas are the only ones passed on to pygame.display.update.
+        Renderer.__init__(self, game)
+        self.drawn = {}  # sprite -> (screen rect, image) drawn last frame
+        self.last_camera = None  # camera position of the last frame
+        self.full_redraw = True
+        self.had_particles = False  # particles were drawn last frame
+        self.stats["dirty_rects"] = 0
+
+    def invalidate(self):
+        # forces a full redraw on the next frame (e.g. the window was uncovered)
+        self.full_redraw = True
+
+    def draw(self, surface, alpha=1.0):
+        view = self.game.camera.view(alpha)
+        visible = self.visible_sprites(view)
+        current = {
+            sprite: (self.screen_rect(sprite, view, alpha), sprite.image)
+            for sprite in visible
+        }
+
+        # scrolling or changed terrain moves every pixel, so the whole screen is redrawn, and
+        # so does the darkness of a dark level when the player's view changed
+        # particles change all over the screen every frame, so they are drawn with a full
+        # redraw too, also on the frame after the last one is gone so it is cleared
+        particles = self.game.particles.count()
+        if (
+            self.full_redraw
+            or view.topleft != self.last_camera
+            or self.game.terrain.dirty
+            or particles
+            or self.had_particles
+            or (self.game.lighting and self.game.lighting.dirty)
+        ):
+            self.had_particles = particles > 0
+            dirty = Renderer.draw(self, surface, alpha)
+            self.drawn = current
+            self.last_camera = view.topleft
+            self.full_redraw = False
+            self.stats["dirty_rects"] = len(dirty)
+            return dirty
+
+        # collects the old and new screen areas of every sprite that changed
+        changed = []
+        for sprite, (rect, image) in current.items():
+            old = self.drawn.pop(sprite, None)
+            if old is None:
+                changed.append(rect)
+            elif old[0] != rect or old[1] is not image:
+                changed.append(old[0])
+                changed.append(rect)
+        # sprites left over from last frame have gone, so their old areas need clearing
+        for rect, image in self.drawn.values():
+            changed.append(rect)
+        self.drawn = current
+
+        screen_rect = surface.get_rect()
+        dirty = [rect.clip(screen_rect) for rect in merge_rects(changed)]
+        dirty = [rect for rect in dirty if rect.width and rect.height]
+
+        # redraws the terrain and the sprites (in layer order) under each dirty area
+        sprites_drawn = 0
+        for area in dirty:
+            surface.set_clip(area)
+            surface.fill(BLACK, area)
+            self.game.terrain.draw(surface, view, area.move(view.topleft))
+            for sprite in visible:
+                rect = current[sprite][0]
+                if rect.colliderect(area):
+                    surface.blit(sprite.image, rect)
+                    sprites_drawn += 1
+            if self.game.lighting:
+                world_area = area.move(view.topleft)
+                self.game.lighting.draw(
+                    surface, view, self.game.terrain.chunk_range(world_area)
+                )
+        surface.set_clip(None)
+
+        self.stats["sprites_drawn"] = sprites_drawn
+        self.stats["sprites_culled"] = len(self.game.all_sprites) - len(visible)
+        self.stats["particles_drawn"] = 0
+        self.stats["dirty_rects"] = len(dirty)
+        return dirty
+
+
+class Upscaler:
+    def __init__(self, display, size):
+        # Low resolution render target
+        # The art is 32px pixel art, so the world, the menus and the overlays are all drawn
+        # at the game's own resolution (size) on an off-screen surface, and the blit cost of
+        # every sprite doesn't depend on how big the window is. present() scales the target
+        # up once per frame by the largest whole factor that fits the window, nearest
+        # neighbour so pixels stay crisp, centred with black bars around it.
+        self.display = display
+        self.target = pygame.Surface(size).convert()
+        self.resize()
+
+    def resize(self):
+        # fits the target to the window, called again whenever the window size changes
+        width, height = self.display.get_size()
+        target_width, target_height = self.target.get_size()
+        self.factor = max(1, min(width // target_width, height // target_height))
+        self.rect = pygame.Rect(
+            0, 0, target_width * self.factor, target_height * self.factor
+        )
+        self.rect.center = self.display.get_rect().center
+        self.display.fill(BLACK)  # the bars around the target
+        self.full = True  # the next present updates the whole window
+
+    def to_target(self, pos):
+        # converts a window position (like a mouse click) to a position on the target
+        return (
+            (pos[0] - self.rect.x) // self.factor,
+            (pos[1] - self.rect.y) // self.factor,
+        )
+
+    def present(self, dirty=None):
+        # scales the changed areas of the target (None for all of it) up to the window and
+        # puts them on screen, so in dirty-rect mode only those areas are scaled
+        if dirty is None or self.full:
+            dirty = [self.target.get_rect()]
+        factor = self.factor
+        display_rect = self.display.get_rect()
+        updates = []
+        for rect in dirty:
+            scaled = pygame.Rect(
+                self.rect.x + rect.x * factor,
+                self.rect.y + rect.y * factor,
+                rect.width * factor,
+                rect.height * factor,
+            )
+            if factor == 1:
+                # nothing to scale, a window smaller than the target shows the middle of it
+                self.display.blit(self.target, scaled.topleft, rect)
+            else:
+                pygame.transform.scale(
+                    self.target.subsurface(rect),
+                    scaled.size,
+                    self.display.subsurface(scaled),
+                )
+            updates.append(scaled.clip(display_rect))
+        if self.full:
+            updates = [display_rect]
+            self.full = False
+        pygame.display.update(updates)
@@ -1,92 +1,215 @@
-import pygame, random, math, sys
+import pygame, random, math, sys, os, time, argparse
 from pygame.locals import *
 from sprites import *
 from config import *
+from terrain import *
+from spatial import *
+from camera import *
+from renderer import *
+from assets import *
+from swarm import *
+from pathfinding import *
+from pool import *
+from animation import *
+from profiler import *
+from controls import *
+from menu import *
+from particles import *
+from lighting import *
+from mapfile import load_map
 
 
 class Game:
-    def __init__(self):
+    def __init__(self, scale=WINDOW_SCALE, fullscreen=FULLSCREEN):
         pygame.init()
         # Sets screen size, clock, default font, and game loop
-        self.screen = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
+        # Everything is drawn on self.screen at WIN_SIZE. A bigger window or fullscreen gets
+        # an off-screen screen that the upscaler scales up once per frame (see present)
+        if fullscreen:
+            self.display = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+        else:
+            self.display = pygame.display.set_mode(
+                (WIN_WIDTH * scale, WIN_HEIGHT * scale)
+            )
+        if self.display.get_size() == (WIN_WIDTH, WIN_HEIGHT):
+            self.upscaler = None
+            self.screen = self.display
+        else:
+            self.upscaler = Upscaler(self.display, (WIN_WIDTH, WIN_HEIGHT))
+            self.screen = self.upscaler.target
         self.clock = pygame.time.Clock()  # Sets clock
         self.font = pygame.font.SysFont("Arial", 30)  # Sets font
         self.running = True  # Sets game loop
+        # Sets whether levels are dark, with fog of war and light from the player and torches
+        self.dark = DARK_LEVELS
+        # Sets whether the game loop runs in real time, or as fast as possible (headless)
+        self.realtime = True
+        # Sets the level layout, create_tilemap builds the world from it
+        self.level = tilemap
+        # Draws the part of the world inside the camera
+        # The dirty-rect renderer only redraws and updates the areas that changed
+        if DIRTY_RECTS:
+            self.renderer = DirtyRenderer(self)
+        else:
+            self.renderer = Renderer(self)
+        # Player input, read once per tick so sessions can be recorded and replayed
+        self.controls = Controls()
+        # Times every part of the frame while its overlay is on (F3)
+        self.profiler = Profiler(self)
 
         # Fonts
-        self.font_roboto = pygame.font.Font(
-            "D:\\Projects\\Game\\RPG\\images\\img\\img\\fonts\\Roboto\\Roboto-Medium.ttf",
-            32,
-        )
+        self.font_roboto = load_font("fonts/Roboto/Roboto-Medium.ttf", 32)
 
         # Spritesheets/Backgrounds
-        self.character_spritesheet = Spritesheet(
-            "D:\\Projects\\Game\\RPG\\images\\img\\img\\character.png"
-        )
-        self.terrain_spritesheet = Spritesheet(
-            "D:\\Projects\\Game\\RPG\\images\\img\\img\\terrain.png"
-        )
-        self.enemy_spritesheet = Spritesheet(
-            "D:\\Projects\\Game\\RPG\\images\\img\\img\\enemy.png"
-        )
-        self.intro_background = pygame.image.load(
-            "D:\\Projects\\Game\\RPG\\images\\img\\img\\introbackground.png"
-        )
-        self.game_over_background = pygame.image.load(
-            "D:\\Projects\\Game\\RPG\\images\\img\\img\\gameover.png"
-        )
-        self.attack_spritesheet = Spritesheet(
-            "D:\\Projects\\Game\\RPG\\images\\img\\img\\attack.png"
-        )
+        self.character_spritesheet = Spritesheet("character.png")
+        self.terrain_spritesheet = Spritesheet("terrain.png")
+        self.enemy_spritesheet = Spritesheet("enemy.png")
+        self.intro_background = load_image("introbackground.png")
+        self.game_over_background = load_image("gameover.png")
+        self.attack_spritesheet = Spritesheet("attack.png")
+
+        # Animation strips
+        # Declared once per sheet; every entity holds references to these shared frames
+        self.character_spritesheet.add_strip("down", [(3, 2), (35, 2), (68, 2)])
+        self.character_spritesheet.add_strip("up", [(3, 34), (35, 34), (68, 34)])
+        self.character_spritesheet.add_strip("left", [(3, 98), (35, 98), (68, 98)])
+        self.character_spritesheet.add_strip("right", [(3, 66), (35, 66), (68, 66)])
+
+        self.enemy_spritesheet.add_strip("up", [(3, 2), (35, 2), (68, 2)])
+        self.enemy_spritesheet.add_strip("down", [(3, 34), (35, 34), (68, 34)])
+        self.enemy_spritesheet.add_strip("left", [(3, 98), (35, 98), (68, 98)])
+        self.enemy_spritesheet.add_strip("right", [(3, 66), (35, 66), (68, 66)])
+
+        attack_frames = [0, 32, 64, 96, 128]
+        self.attack_spritesheet.add_strip("up", [(x, 0) for x in attack_frames])
+        self.attack_spritesheet.add_strip("down", [(x, 32) for x in attack_frames])
+        self.attack_spritesheet.add_strip("right", [(x, 64) for x in attack_frames])
+        self.attack_spritesheet.add_strip("left", [(x, 96) for x in attack_frames])
+
+        # Animation clips, by name, shared by every entity of a kind
+        # Walking loops over frames 1 and 2, frame 0 is the standing pose
+        self.player_clips = {}
+        self.enemy_clips = {}
+        self.attack_clips = {}
+        for facing in ["up", "down", "left", "right"]:
+            strip = self.character_spritesheet.get_strip(facing)
+            self.player_clips["idle_" + facing] = Clip(strip[:1], WALK_FRAME_TIME)
+            self.player_clips["walk_" + facing] = Clip(strip[1:], WALK_FRAME_TIME)
+            strip = self.enemy_spritesheet.get_strip(facing)
+            self.enemy_clips["walk_" + facing] = Clip(strip[1:], WALK_FRAME_TIME)
+            # an attack plays once, then goes back to the pool
+            strip = self.attack_spritesheet.get_strip(facing)
+            self.attack_clips[facing] = Clip(
+                strip, ATTACK_FRAME_TIME, loop=False, on_end=Attack.finish
+            )
+
+        # Torches come from the dungeon pack as 16px frames, drawn at double size like the tiles
+        torch_frames = [
+            pygame.transform.scale2x(
+                load_image(
+                    "../../2D Pixel Dungeon Asset Pack/items and trap_animation/torch/"
+                    f"torch_{number}.png",
+                    alpha=True,
+                )
+            )
+            for number in range(1, 5)
+        ]
+        self.torch_clips = {"burn": Clip(torch_frames, TORCH_FRAME_TIME)}
+
+        # Particle images, a dot fading out over the particle's life
+        self.spark_images = fade_images(YELLOW, 3)
+        self.dust_images = fade_images((150, 130, 100), 4)
 
     def create_tilemap(self):
         # Creates tilemap
-        # Iterates through tilemap, enumerating gives row number
-        for row, tiles in enumerate(tilemap):
-            for col, tile in enumerate(tiles):
-                Ground(self, col, row)
-                if tile == "B":
-                    Block(self, col, row)
-                if tile == "P":
-                    self.player = Player(self, col, row)  # Creates player object
-                if tile == "E":
-                    Enemy(self, col, row)
-                    """
-                if tile == " ":
-                    Grass(self, col, row)
-                    """
-
-    def camera(self, target):
-        def __init__(self, width, height):
-            self.rect = pygame.Rect(0, 0, width, height)
-            self.width = width
-            self.height = height
-
-        def update(self, target):
-            x = target.rect.centerx - int(width / 2)
-            y = target.rect.centery - int(height / 2)
-
-            # limit scrolling
-            x = max(0, x)  # left
-            y = max(0, y)  # top
-
-            x = min((bg_width - width), x)
-            y = min((bg_height - height), y)
-
-            self.rect = pygame.Rect(x, y, self.width, self.height)
-
-    def new(self):
+        # The level is a text map or the path of a map file (mapfile.py)
+        world = load_map(self.level)
+        # Static terrain (ground and walls) is pre-rendered into chunks by the tile layer
+        self.terrain = TileLayer(self, world)
+        # Walls are resolved through the solid-tile grid instead of Block sprites
+        self.grid = TileGrid(world)
+        # Flow fields on the grid that lead enemies to the player
+        self.pathfinder = Pathfinder(self.grid)
+        # Field of view and light on dark levels, None when the whole level is lit
+        self.lighting = Lighting(self.grid) if self.dark else None
+        # Spawns the player, enemies and torches from the map's object layer
+        for kind, col, row in world.objects:
+            if kind == "P":
+                self.player = Player(self, col, row)  # Creates player object
+            if kind == "E":
+                Enemy(self, col, row)
+            if kind == "L":
+                Torch(self, col, row)
+                if self.lighting:
+                    self.lighting.add_light(col, row)
+
+    def set_tile(self, col, row, tile):
+        # changes a tile of the level to a text map character while playing
+        # this is the only entry point for tile changes: the terrain and the grid share the
+        # tiles, the terrain redraws the tile's chunk and the grid updates the solid table
+        # and its version, which makes the flow fields and the lighting recompute
+        if self.terrain.set_tile(col, row, tile):
+            self.grid.set_tile(col, row, tile)
+
+    def new(self, seed=None):
         # New game starts
         self.playing = True
+        # Every random choice in a session comes from this seed, so a session can be repeated
+        if seed is None:
+            seed = random.getrandbits(32)
+        self.seed = seed
+        random.seed(seed)
+        self.controls.begin(seed, self.level)
 
         # Sprite groups
         self.all_sprites = pygame.sprite.LayeredUpdates()
-        self.blocks = pygame.sprite.LayeredUpdates()
         self.enemies = pygame.sprite.LayeredUpdates()
         self.attacks = pygame.sprite.LayeredUpdates()
+        # Spatial hash of moving entities (player, enemies, attacks) for neighbourhood queries
+        self.entities = SpatialHash()
+        # Array-backed store that simulates every enemy in one batch
+        self.swarm = EnemySwarm(self)
+        # Attack sprites are preallocated and reused
+        # Advances every animation once per tick, the swarm animates its enemies as one batch
+        self.animations = AnimationSystem()
+        self.animations.add_batch(self.swarm)
+        self.attack_pool = SpritePool(lambda: Attack(self), ATTACK_POOL_SIZE)
+        # Combat and movement effects, arrays of particles instead of sprites
+        # hit sparks fly over the enemies, dust stays under everything that walks
+        self.particles = ParticleSystem()
+        self.particles.add(
+            "sparks",
+            Emitter(
+                self.spark_images,
+                PARTICLE_CAPACITY,
+                ENEMY_LAYER,
+                speed=(60, 180),
+                life=(0.15, 0.4),
+                drag=4,
+            ),
+        )
+        self.particles.add(
+            "dust",
+            Emitter(
+                self.dust_images,
+                PARTICLE_CAPACITY,
+                BLOCK_LAYER,
+                speed=(10, 30),
+                life=(0.3, 0.6),
+                gravity=-20,
+            ),
+        )
 
         # Creates tilemap
         self.create_tilemap()
+        # the screen still shows the menu, so the first frame is drawn in full
+        self.renderer.invalidate()
+
+        # Creates camera, clamped to the size of the map
+        self.camera = Camera(
+            WIN_WIDTH, WIN_HEIGHT, self.terrain.width, self.terrain.height
+        )
+        self.camera.snap(self.player)
 
     def events(self):
         # game loop events
@@ -97,28 +220,112 @@ class Game:
                 if self.playing:
                     self.playing = False
                 self.running = False
+            # space swings an attack on the next tick
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+                self.controls.press(ACTION_ATTACK)
+            # F3 toggles the profiler overlay, F4 exports the profiled frames
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.profiler.toggle()
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                path = self.profiler.export()
+                if path:
+                    print(f"profile written to {path}")
+            # the window was uncovered, so the screen needs redrawing in full
+            if event.type == pygame.WINDOWEXPOSED:
+                self.invalidate()
+        self.profiler.mark("events")
 
     def update(self):
         # game loop update
-        self.all_sprites.update()
-        self.camera(self.player)
-
-    def draw(self):
+        # every step is marked, so the profiler can tell where the tick went
+        profiler = self.profiler
+        self.controls.tick()  # this tick's input
+        if self.controls.finished:
+            # a replay ran out of recorded input
+            self.playing = False
+            return
+        if self.controls.held(ACTION_ATTACK) and self.player.alive():
+            self.player.attack()
+        profiler.mark("update/input")
+        self.pathfinder.update(self.player)  # field towards the tile the player is on
+        profiler.mark("update/pathfinding")
+        self.swarm.step()  # moves every enemy at once
+        profiler.mark("update/swarm")
+        if profiler.enabled:
+            profiler.update_sprites(self.all_sprites)  # also times each sprite class
+        else:
+            self.all_sprites.update()
+        profiler.mark("update/sprites")
+        self.animations.update(TICK)  # advances every animation by one tick
+        profiler.mark("update/animation")
+        self.particles.update(TICK)  # moves and ages every particle
+        profiler.mark("update/particles")
+        self.camera.update(self.player)  # follows the player
+        profiler.mark("update/camera")
+        if self.lighting:
+            # only recomputed when the player walked onto another tile or the level changed
+            self.lighting.update(self.player)
+            profiler.mark("update/lighting")
+
+    def draw(self, alpha=1.0):
         # draws and renders game objects
-        self.screen.fill(BLACK)  # fills screen with black
-        self.all_sprites.draw(self.screen)  # draws sprites on screen
-        self.clock.tick(FPS)  # sets game FPS
-        pygame.display.update()  # updates screen
+        # alpha is how far between the last two ticks the frame is, for interpolated positions
+        # draws the terrain and sprites inside the camera, returns the changed screen areas
+        dirty = self.renderer.draw(self.screen, alpha)
+        self.profiler.mark("draw")
+        overlay = self.profiler.draw(self.screen)
+        if overlay:
+            dirty.append(overlay)
+            self.profiler.mark("overlay")
+        self.present(dirty)  # updates the changed areas of the screen
+        self.profiler.mark("present")
+
+    def present(self, dirty=None):
+        # puts the changed areas of self.screen (None for all of it) on the display
+        if self.upscaler:
+            self.upscaler.present(dirty)
+        elif dirty is None:
+            pygame.display.update()
+        else:
+            pygame.display.update(dirty)
+
+    def invalidate(self):
+        # redraws and presents the whole window on the next frame
+        self.renderer.invalidate()
+        if self.upscaler:
+            self.upscaler.resize()
+
+    def to_screen(self, pos):
+        # converts a window position (like a mouse click) to a position on self.screen
+        if self.upscaler:
+            return self.upscaler.to_target(pos)
+        return pos
 
     def main(self):
         # game loop
+        # The simulation advances in fixed TICK steps, the accumulator collects the real time
+        # that has passed and every whole tick in it is simulated before the frame is drawn.
+        # Under load frames are dropped, not ticks, so the game speed stays the same.
+        accumulator = 0.0
+        self.clock.tick()  # starts timing from here, not from the last screen
         while self.playing:
+            self.profiler.begin_frame()
+            if self.realtime:
+                # sets game FPS, a long frame is capped so the catch-up can't spiral
+                accumulator += min(self.clock.tick(FPS) / 1000, MAX_FRAME_TIME)
+            else:
+                # headless, one tick per frame as fast as possible
+                self.clock.tick()
+                accumulator += TICK
+            self.profiler.mark("wait")  # time spent in the frame limiter
+
             self.events()  # Listening for inputs
-            self.update()  # Updating sprites
-            self.draw()  # Drawing sprites
+            while accumulator >= TICK and self.playing:
+                self.update()  # Updating sprites
+                accumulator -= TICK
+            self.draw(accumulator / TICK)  # Drawing sprites
 
     def game_over(self):
-        game_over = True
         end_text = self.font.render("Game Over", True, WHITE)
         end_text_rect = end_text.get_rect(center=(WIN_WIDTH / 2, WIN_HEIGHT / 2))
 
@@ -127,75 +334,92 @@ class Game:
         for sprite in self.all_sprites:
             sprite.kill()
 
-        while self.running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.running = False
-
-            mouse_pos = pygame.mouse.get_pos()
-            click = pygame.mouse.get_pressed()
+        # the screen is static, it waits for a click instead of redrawing every frame
+        menu = Menu(self, self.game_over_background)
+        menu.add_text(end_text, end_text_rect)
+        menu.add_button(restart_button, "restart")
 
-            if restart_button.is_pressed(mouse_pos, click):
-                self.new()
-                self.main()
-
-            self.screen.blit(self.game_over_background, (0, 0))
-            self.screen.blit(end_text, end_text_rect)
-            self.screen.blit(
-                restart_button.image, (restart_button.rect.x, restart_button.rect.y)
-            )
-            self.clock.tick(FPS)
-            pygame.display.update()
+        # returns whether Restart was clicked, False if the window was closed
+        return menu.run() == "restart"
 
     def intro_screen(self):
         # Intro screen
-        # temp variable for loop
-        intro = True
         # Creates title and play button
         title = self.font.render("RPG Game", True, BLACK)
         # Gets rect of title and centers it
         title_rect = title.get_rect(center=(WIN_WIDTH / 2, WIN_HEIGHT - 500))
-        # Creates play button
+        # Creates play button, centered on the intro screen
         play_button = Button(10, 15, 100, 50, WHITE, BLACK, "Play", 32)
-        #
-        while intro:
-            # Checks for quit event
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    intro = False
-                    self.running = False
-
-            # assign variable for mouse position and click
-            mouse_pos = pygame.mouse.get_pos()
-            click = pygame.mouse.get_pressed()
-
-            # Closes intro screen if play button is pressed
-            if play_button.is_pressed(mouse_pos, click):
-                intro = False
-
-            # Update the position of the button to center it on the intro screen
-            play_button.update_position(WIN_WIDTH, WIN_HEIGHT)
-
-            # Draws intro screen
-            self.screen.blit(self.intro_background, (0, 0))
-            self.screen.blit(title, title_rect)
-            self.screen.blit(
-                play_button.image, (play_button.rect.x, play_button.rect.y)
-            )
-
-            self.clock.tick(FPS)
-            pygame.display.update()
-
-
-# Creates game object
-g = Game()
-g.intro_screen()
-g.new()
-# Game loop
-while g.running:
-    g.main()
-    g.game_over()
-
-# Quits game when game loop is broken
-pygame.quit()
-sys.exit()
+        play_button.update_position(WIN_WIDTH, WIN_HEIGHT)
+
+        # the screen is static, it waits for a click instead of redrawing every frame
+        menu = Menu(self, self.intro_background)
+        menu.add_text(title, title_rect)
+        menu.add_button(play_button, "play")
+        menu.run()  # returns once Play is clicked or the window is closed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RPG game")
+    parser.add_argument("--seed", type=int, help="seed for the session")
+    parser.add_argument("--map", help="play a map file (see mapfile.py)")
+    parser.add_argument("--record", metavar="FILE", help="record the session to FILE")
+    parser.add_argument("--replay", metavar="FILE", help="replay a recorded session")
+    parser.add_argument(
+        "--scale",
+        type=int,
+        default=WINDOW_SCALE,
+        help="window size as a multiple of 960x540, drawn at 960x540 and scaled up",
+    )
+    parser.add_argument("--fullscreen", action="store_true", help="play fullscreen")
+    parser.add_argument(
+        "--dark", action="store_true", help="dark levels, lit by the player and torches"
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="replay without a window, as fast as possible",
+    )
+    args = parser.parse_args()
+    if args.headless:
+        if not args.replay:
+            parser.error("--headless needs --replay")
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+
+    # Creates game object
+    g = Game(args.scale, args.fullscreen or FULLSCREEN)
+    g.dark = args.dark or DARK_LEVELS
+
+    if args.replay:
+        # plays the recorded session once, with its level, seed and input
+        g.controls = Replay(args.replay)
+        g.level = g.controls.level
+        g.realtime = not args.headless
+        g.new(g.controls.seed)
+        start = time.perf_counter()
+        g.main()
+        print(
+            f"replayed {g.controls.position} ticks in {time.perf_counter() - start:.2f} s, "
+            f"player {'alive' if g.player.alive() else 'dead'} at {g.player.rect.topleft}"
+        )
+        pygame.quit()
+        sys.exit()
+
+    if args.map:
+        g.level = args.map
+    if args.record:
+        g.controls = Recorder()
+    g.intro_screen()
+    g.new(args.seed)
+    # Game loop, a new session starts every time Restart is clicked
+    while g.running:
+        g.main()
+        if args.record:
+            # saved after every session, so the file keeps the last one played
+            g.controls.save(args.record)
+        if g.running and g.game_over():
+            g.new()
+
+    # Quits game when game loop is broken
+    pygame.quit()
+    sys.exit()
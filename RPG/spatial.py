@@ -0,0 +1,113 @@
+import pygame
+from config import *
+
+
+class SpatialHash(pygame.sprite.AbstractGroup):
+    def __init__(self, cell_size=SPATIAL_CELL_SIZE):
+        # Uniform spatial hash for moving entities
+        # Sprites are bucketed by the grid cell their rect's top left corner is in, so
+        # neighbourhood and overlap queries only look at nearby sprites instead of scanning
+        # a whole group. One cell per sprite keeps moving cheap: a sprite is only
+        # re-bucketed when its corner crosses a cell edge, and then only one set changes.
+        # Sprites can't be bigger than a cell, queries look one cell further up and left
+        # for the sprites reaching into the area from there.
+        # It is a sprite group, so sprite.kill() also takes the sprite out of the hash.
+        pygame.sprite.AbstractGroup.__init__(self)
+        self.cell_size = cell_size
+        self.cells = {}  # (cell x, cell y) -> set of sprites
+        self.sprite_cells = {}  # sprite -> cell (x, y) it is stored in
+        # sprite -> the order it was added in, breaks draw order ties between overlapping
+        # sprites the same way every frame and every run (sets have no stable order)
+        self.spawn_order = {}
+        self.added = 0
+        self.queries = 0  # number of queries so far, read by the profiler
+
+    def cell_of(self, rect):
+        # returns the cell a rect is stored in
+        return (rect.x // self.cell_size, rect.y // self.cell_size)
+
+    def add_internal(self, sprite, layer=None):
+        # called by add() and sprite groups, stores the sprite in the cell of its corner
+        pygame.sprite.AbstractGroup.add_internal(self, sprite)
+        cell = self.cell_of(sprite.rect)
+        self.sprite_cells[sprite] = cell
+        self.spawn_order[sprite] = self.added
+        self.added += 1
+        self.link(sprite, cell)
+
+    def remove_internal(self, sprite):
+        # called by remove() and sprite.kill()
+        pygame.sprite.AbstractGroup.remove_internal(self, sprite)
+        self.unlink(sprite, self.sprite_cells.pop(sprite))
+        del self.spawn_order[sprite]
+
+    def link(self, sprite, cell):
+        sprites = self.cells.get(cell)
+        if sprites is None:
+            sprites = self.cells[cell] = set()
+        sprites.add(sprite)
+
+    def unlink(self, sprite, cell):
+        sprites = self.cells[cell]
+        sprites.discard(sprite)
+        # drops empty cells so the dict only holds occupied space
+        if not sprites:
+            del self.cells[cell]
+
+    def move(self, sprite):
+        # call after a sprite's rect has moved
+        # the sprite is only re-bucketed when its corner crosses into a different cell
+        cell = self.cell_of(sprite.rect)
+        old_cell = self.sprite_cells.get(sprite)
+        if old_cell == cell or old_cell is None:
+            return
+        self.unlink(sprite, old_cell)
+        self.link(sprite, cell)
+        self.sprite_cells[sprite] = cell
+
+    def candidates(self, rect):
+        # returns every sprite stored in the cells a rect covers (may not overlap rect itself)
+        self.queries += 1
+        found = set()
+        size = self.cell_size
+        # a sprite stored one cell up or left can still reach into rect
+        x0 = (rect.left - size) // size
+        y0 = (rect.top - size) // size
+        x1 = (rect.right - 1) // size
+        y1 = (rect.bottom - 1) // size
+        cells = self.cells
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                cell = cells.get((cx, cy))
+                if cell:
+                    found.update(cell)
+        return found
+
+    def query_rect(self, rect, group=None):
+        # returns the sprites overlapping rect, optionally only those in group
+        hits = []
+        for sprite in self.candidates(rect):
+            if rect.colliderect(sprite.rect) and (group is None or sprite in group):
+                hits.append(sprite)
+        return hits
+
+    def query_radius(self, pos, radius, group=None):
+        # returns the sprites whose centre is within radius of pos, optionally only those in group
+        x, y = pos
+        area = pygame.Rect(x - radius, y - radius, radius * 2 + 1, radius * 2 + 1)
+        radius_sq = radius * radius
+        hits = []
+        for sprite in self.candidates(area):
+            dx = sprite.rect.centerx - x
+            dy = sprite.rect.centery - y
+            if dx * dx + dy * dy <= radius_sq and (group is None or sprite in group):
+                hits.append(sprite)
+        return hits
+
+    def collide(self, sprite, group=None):
+        # returns the other sprites overlapping sprite, optionally only those in group
+        # in the order they were added, not the cells' set order, so what the game does with
+        # the hits (like killing enemies, which reorders the swarm) is the same every run
+        hits = [hit for hit in self.query_rect(sprite.rect, group) if hit is not sprite]
+        hits.sort(key=self.spawn_order.__getitem__)
+        return hits
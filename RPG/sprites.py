@@ -2,9 +2,13 @@ from typing import Any
 import pygame
 from pygame.sprite import Group, Group
 from config import *
+from assets import load_image, load_font
+from atlas import load_atlas
+from swarm import FACINGS
+from animation import Animator
+from controls import ACTION_LEFT, ACTION_RIGHT, ACTION_UP, ACTION_DOWN, ACTION_SPRINT
 import sys
 import math
-import random
 
 # SPRITES NEEDED:
 # Player (DONE)
@@ -29,22 +33,80 @@ import random
 # Rock
 
 
+# Where an attack lands relative to the player, by facing direction
+ATTACK_OFFSETS = {
+    "up": (0, -TILESIZE),
+    "down": (0, TILESIZE),
+    "left": (-TILESIZE, 0),
+    "right": (TILESIZE, 0),
+}
+
+
 class Spritesheet:
+    # frame cache shared by every spritesheet, keyed by (sheet file, x, y, width, height)
+    # entities cut from the same sheet and rect all get the same surface back
+    frames = {}
+
     def __init__(self, file):
-        # loads spritesheet
-        self.sheet = pygame.image.load(file).convert()
+        # spritesheet, file is the image name relative to IMG_DIR
+        # frames come from the texture atlas (atlas.py) when it has them, the sheet image
+        # itself is only loaded for frames the atlas doesn't have
+        self.file = file
+        self.sheet = None
+        self.atlas = load_atlas()
+        # named animation strips, declared once per sheet with add_strip
+        self.strips = {}
 
     def get_sprite(self, x, y, width, height):
-        # gets sprite from sheet
-        sprite = pygame.Surface([width, height])
-        # blits sprite from sheet to sprite surface
-        # (x,y) is the top left corner of the sprite on the sheet, using the width and height of the sprite
-        sprite.blit(self.sheet, (0, 0), (x, y, width, height))
-        # sets colorkey of sprite to black
-        sprite.set_colorkey(BLACK)
+        # returns the cached frame if this rect has already been cut from the sheet
+        key = (self.file, x, y, width, height)
+        sprite = Spritesheet.frames.get(key)
+        if sprite is not None:
+            return sprite
+
+        # packed frames are subsurfaces of an atlas page
+        if self.atlas is not None:
+            sprite = self.atlas.source_frame(*key)
+        if sprite is None:
+            if self.sheet is None:
+                self.sheet = load_image(self.file)
+            # gets sprite from sheet
+            sprite = pygame.Surface([width, height])
+            # blits sprite from sheet to sprite surface
+            # (x,y) is the top left corner of the sprite on the sheet, using the width and height of the sprite
+            sprite.blit(self.sheet, (0, 0), (x, y, width, height))
+            # sets colorkey of sprite to black
+            sprite.set_colorkey(BLACK)
+        # stores sprite so later lookups are free
+        Spritesheet.frames[key] = sprite
         # returns sprite
         return sprite
 
+    def add_strip(self, name, positions, width=TILESIZE, height=TILESIZE):
+        # declares a named animation strip from a list of (x, y) positions on the sheet
+        # the frames come from the shared cache, so every entity using the strip holds the same surfaces
+        self.strips[name] = [self.get_sprite(x, y, width, height) for x, y in positions]
+
+    def get_strip(self, name):
+        # returns the shared frame list for a named strip
+        # strips that weren't declared are looked up as the sheet's animations in the atlas
+        strip = self.strips.get(name)
+        if strip is None:
+            strip = self.strips[name] = self.atlas_lookup("animation", name)
+        return strip
+
+    def get_frame(self, name):
+        # returns a frame of this sheet by its name in the atlas, like "down/0"
+        return self.atlas_lookup("frame", name)
+
+    def atlas_lookup(self, method, name):
+        # method is the atlas lookup to use by name, so a missing atlas raises the KeyError
+        sheet_name = self.atlas and self.atlas.sheet_names.get(self.file)
+        found = getattr(self.atlas, method)(f"{sheet_name}/{name}") if sheet_name else None
+        if found is None:
+            raise KeyError(f"{self.file} has no {name} in the texture atlas (python atlas.py build)")
+        return found
+
 
 class Player(pygame.sprite.Sprite):
     def __init__(self, game, x, y):
@@ -64,7 +126,6 @@ class Player(pygame.sprite.Sprite):
         self.y_change = 0
 
         self.facing = "down"  # Sets default player facing direction for animation
-        self.animation_loop = 1  # Sets default player animation frame
 
         # Set player image
         # This calls the spritesheet class and gets the sprite from the sheet
@@ -79,58 +140,59 @@ class Player(pygame.sprite.Sprite):
         # Set player rect x/y to match player x/y
         self.rect.x = self.x
         self.rect.y = self.y
+        # registers the player in the spatial hash once it has a rect
+        self.game.entities.add(self)
+        # position at the start of the last tick, for interpolated drawing
+        self.prev_pos = self.rect.topleft
 
-        # set player animation cells (for animation strips)
-        # each sprite is loaded from pixel coordinates on the spritesheet, using the width and height of the sprite
-        self.down_animations = [
-            self.game.character_spritesheet.get_sprite(3, 2, self.width, self.height),
-            self.game.character_spritesheet.get_sprite(35, 2, self.width, self.height),
-            self.game.character_spritesheet.get_sprite(68, 2, self.width, self.height),
-        ]
-
-        self.up_animations = [
-            self.game.character_spritesheet.get_sprite(3, 34, self.width, self.height),
-            self.game.character_spritesheet.get_sprite(35, 34, self.width, self.height),
-            self.game.character_spritesheet.get_sprite(68, 34, self.width, self.height),
-        ]
-
-        self.left_animations = [
-            self.game.character_spritesheet.get_sprite(3, 98, self.width, self.height),
-            self.game.character_spritesheet.get_sprite(35, 98, self.width, self.height),
-            self.game.character_spritesheet.get_sprite(68, 98, self.width, self.height),
-        ]
-
-        self.right_animations = [
-            self.game.character_spritesheet.get_sprite(3, 66, self.width, self.height),
-            self.game.character_spritesheet.get_sprite(35, 66, self.width, self.height),
-            self.game.character_spritesheet.get_sprite(68, 66, self.width, self.height),
-        ]
+        # set player animation, clips are shared by every player and advanced by game.animations
+        self.animator = Animator(self, self.game.player_clips, "idle_down")
+        self.game.animations.add(self.animator)
 
     # This is the game loop update function for the player
     def update(self):
-        # Update player x/y
+        self.prev_pos = self.rect.topleft
+        # Set player x_change/y_change from this tick's input
         self.movement()
-        # animates player
-        self.animate()
+        # picks the player's animation clip, walking while moving and idle otherwise
+        if self.x_change == 0 and self.y_change == 0:
+            self.animator.play("idle_" + self.facing)
+        else:
+            self.animator.play("walk_" + self.facing)
+
+        # moves the float position, swept through the tile grid so it stops at walls
+        # the rect follows the position, so fractions of a pixel add up over ticks
+        self.x, self.y, _, _ = self.game.grid.sweep(
+            self.x, self.y, self.width, self.height, self.x_change, self.y_change
+        )
+        self.rect.x = math.floor(self.x)
+        self.rect.y = math.floor(self.y)
+        if self.game.controls.held(ACTION_SPRINT) and (self.x_change or self.y_change):
+            # kicks up dust behind the player's feet while sprinting
+            self.game.particles.emit(
+                "dust",
+                self.rect.centerx,
+                self.rect.bottom - 4,
+                1,
+                math.atan2(-self.y_change, -self.x_change),
+                0.6,
+            )
+        self.game.entities.move(self)  # updates the player's cells in the spatial hash
+
         # checks for collision with enemies
         self.collide_enemy()
 
-        # Set player rect x/y to match player x/y
-        self.rect.x += self.x_change
-        self.collide_blocks("x")  # checks for collision with blocks on x axis
-        self.rect.y += self.y_change
-        self.collide_blocks("y")  # checks for collision with blocks on y axis
-
         # reset player movement change variables
         self.x_change = 0
         self.y_change = 0
 
     # This is where the player movement is handled
     def movement(self):
-        keys = pygame.key.get_pressed()  # creates instance of keys pressed
+        # this tick's input, from the keyboard or a replay
+        keys = self.game.controls
 
         # Sprinting
-        if keys[pygame.K_LSHIFT] or keys[pygame.K_RSHIFT]:
+        if keys.held(ACTION_SPRINT):
             sprint_multiplier = 1.5
         else:
             sprint_multiplier = 1
@@ -139,35 +201,35 @@ class Player(pygame.sprite.Sprite):
         damping = 1  # You can adjust this value to control the momentum effect
 
         # Diagonal movement math
-        diagonal_move = (keys[pygame.K_LEFT] or keys[pygame.K_RIGHT]) and (
-            keys[pygame.K_UP] or keys[pygame.K_DOWN]
+        diagonal_move = (keys.held(ACTION_LEFT) or keys.held(ACTION_RIGHT)) and (
+            keys.held(ACTION_UP) or keys.held(ACTION_DOWN)
         )
         # Diagonal movement multiplier
         diagonal_multiplier = 1 / math.sqrt(2)
 
         # character movement with arrow keys
-        if keys[pygame.K_LEFT]:
+        if keys.held(ACTION_LEFT):
             if diagonal_move:
                 self.x_change = -PLAYER_SPEED * sprint_multiplier * diagonal_multiplier
             else:
                 self.x_change = -PLAYER_SPEED * sprint_multiplier
             self.facing = "left"
 
-        if keys[pygame.K_RIGHT]:
+        if keys.held(ACTION_RIGHT):
             if diagonal_move:
                 self.x_change = PLAYER_SPEED * sprint_multiplier * diagonal_multiplier
             else:
                 self.x_change = PLAYER_SPEED * sprint_multiplier
             self.facing = "right"
 
-        if keys[pygame.K_UP]:
+        if keys.held(ACTION_UP):
             if diagonal_move:
                 self.y_change = -PLAYER_SPEED * sprint_multiplier * diagonal_multiplier
             else:
                 self.y_change = -PLAYER_SPEED * sprint_multiplier
             self.facing = "up"
 
-        if keys[pygame.K_DOWN]:
+        if keys.held(ACTION_DOWN):
             if diagonal_move:
                 self.y_change = PLAYER_SPEED * sprint_multiplier * diagonal_multiplier
             else:
@@ -178,158 +240,28 @@ class Player(pygame.sprite.Sprite):
         self.x_change *= damping
         self.y_change *= damping
 
-        # Update player position
-        self.rect.x += self.x_change
-        self.rect.y += self.y_change
-
-    # This is where the player collision is handled
-    def collide_blocks(self, direction):
-        if direction == "x":
-            # checks for collision with blocks on x axis by comparing the player rect to the block rect
-            # The False argument is for the sprite kill argument, which we don't want to use for blocks
-            hits = pygame.sprite.spritecollide(self, self.game.blocks, False)
-            if hits:
-                # if the player is moving right
-                if self.x_change > 0:
-                    for sprite in self.game.all_sprites:
-                        sprite.rect.x += self.x_change
-                    # if there is a collision, stop the player rect from moving beyond the opposite side of the block rect
-                    self.rect.right = hits[0].rect.left
-                # if the player is moving left
-                if self.x_change < 0:
-                    for sprite in self.game.all_sprites:
-                        sprite.rect.x += self.x_change
-                    # if there is a collision, stop the player rect from moving beyond the opposite side of the block rect
-                    self.rect.left = hits[0].rect.right
-
-        if direction == "y":
-            # checks for collision with blocks on y axis
-            hits = pygame.sprite.spritecollide(self, self.game.blocks, False)
-            if hits:
-                # if player is moving down
-                if self.y_change > 0:
-                    # move all sprites with the player rect, stopping on collision
-                    for sprite in self.game.all_sprites:
-                        sprite.rect.y += self.y_change
-                    # if there is a collision, stop the player rect from moving beyond the opposite side of the block rect
-                    self.rect.bottom = hits[0].rect.top
-                # if the player is moving up
-                if self.y_change < 0:
-                    for sprite in self.game.all_sprites:
-                        sprite.rect.y += self.y_change
-                    # if there is a collision, stop the player rect from moving beyond the opposite side of the block rect
-                    self.rect.top = hits[0].rect.bottom
-
-    # This is where the player animation is handled, including the animation strips and logic
-    def animate(self):
-        # Animation
-        # Animates player based on direction
-        if self.facing == "down":
-            # if the player is not moving, set the player image to the first frame of the animation
-            if self.x_change == 0 and self.y_change == 0:
-                self.image = self.down_animations[0]
-            else:
-                # sets the player image to the current frame of the animation
-                self.image = self.down_animations[math.floor(self.animation_loop)]
-                # adds to the animation loop
-                self.animation_loop += 0.1
-                # if the animation loop is greater than the length of the animation, reset the animation loop
-                if self.animation_loop >= len(self.down_animations):
-                    self.animation_loop = 1
-
-        if self.facing == "up":
-            if self.x_change == 0 and self.y_change == 0:
-                self.image = self.up_animations[0]
-            else:
-                self.image = self.up_animations[math.floor(self.animation_loop)]
-                self.animation_loop += 0.1
-                if self.animation_loop >= len(self.up_animations):
-                    self.animation_loop = 1
-
-        if self.facing == "left":
-            if self.x_change == 0 and self.y_change == 0:
-                self.image = self.left_animations[0]
-            else:
-                self.image = self.left_animations[math.floor(self.animation_loop)]
-                self.animation_loop += 0.1
-                if self.animation_loop >= len(self.left_animations):
-                    self.animation_loop = 1
-
-        if self.facing == "right":
-            if self.x_change == 0 and self.y_change == 0:
-                self.image = self.right_animations[0]
-            else:
-                self.image = self.right_animations[math.floor(self.animation_loop)]
-                self.animation_loop += 0.1
-                if self.animation_loop >= len(self.right_animations):
-                    self.animation_loop = 1
+    # Swings an attack on the tile the player is facing
+    def attack(self):
+        dx, dy = ATTACK_OFFSETS[self.facing]
+        # the attack sprite comes from the pool, so swinging doesn't build anything
+        self.game.attack_pool.acquire(self.rect.x + dx, self.rect.y + dy)
 
     #
     def collide_enemy(self):
         # checks for collision with enemies between the player and sprites in the enemies group
-        hits = pygame.sprite.spritecollide(self, self.game.enemies, False)
+        # only enemies in the player's spatial hash cells are tested
+        hits = self.game.entities.collide(self, self.game.enemies)
         if hits:
             # if there is a collision, kill the player and end the game
             self.kill()
             self.game.playing = False
 
 
-class Block(pygame.sprite.Sprite):
-    def __init__(self, game, x, y):
-        self.game = game
-        self._layer = BLOCK_LAYER
-
-        self.groups = (
-            self.game.all_sprites,
-            self.game.blocks,
-        )  # Sets wall sprite group both all_sprites and blocks
-
-        pygame.sprite.Sprite.__init__(self, self.groups)  # Initializes wall sprite
-
-        self.x = x * TILESIZE
-        self.y = y * TILESIZE
-        self.width = TILESIZE
-        self.height = TILESIZE
-
-        # sets wall image
-        self.image = self.game.terrain_spritesheet.get_sprite(
-            960, 448, self.width, self.height
-        )
-
-        # sets wall hitbox
-        self.rect = self.image.get_rect()  # Sets wall rect
-        self.rect.x = self.x
-        self.rect.y = self.y
-
-
-class Ground(pygame.sprite.Sprite):
-    def __init__(self, game, x, y):
-        self.game = game
-        self._layer = GROUND_LAYER
-
-        self.groups = self.game.all_sprites
-
-        pygame.sprite.Sprite.__init__(self, self.groups)  # Initializes ground sprite
-
-        self.x = x * TILESIZE
-        self.y = y * TILESIZE
-        self.width = TILESIZE
-        self.height = TILESIZE
-
-        # sets ground image
-        self.image = self.game.terrain_spritesheet.get_sprite(
-            64, 352, self.width, self.height
-        )
-
-        # sets wall hitbox
-        self.rect = self.image.get_rect()  # Sets ground rect
-        self.rect.x = self.x
-        self.rect.y = self.y
-
-
 class Enemy(pygame.sprite.Sprite):
     def __init__(self, game, x, y):
         # Enemy sprite init
+        # The enemy's state lives in the game's EnemySwarm arrays, which move and animate
+        # every enemy in one batch; the sprite is a view of its slot for drawing and collisions
         self.game = game
         self._layer = ENEMY_LAYER
         self.groups = (
@@ -338,149 +270,63 @@ class Enemy(pygame.sprite.Sprite):
         )
         pygame.sprite.Sprite.__init__(self, self.groups)
 
-        self.x = x * TILESIZE
-        self.y = y * TILESIZE
         self.width = TILESIZE
         self.height = TILESIZE
 
-        # temp variables for enemy movement
-        self.x_change = 0
-        self.y_change = 0
-
-        self.facing = random.choice(
-            ["up", "down", "left", "right"]
-        )  # Sets default enemy facing direction for animation
-        self.animation_loop = 1  # Sets default player animation frame
-        self.movement_loop = 0  # Sets default enemy movement loop
-        self.max_travel = random.randint(
-            1, 200
-        )  # Sets default enemy max travel distance
-
-        # sets enemy image
+        # sets enemy image, the swarm swaps in animation frames from then on
         self.image = self.game.enemy_spritesheet.get_sprite(
             3, 2, self.width, self.height
         )
-        # set sprite as transparent
-        self.image.set_colorkey(BLACK)
 
         self.rect = self.image.get_rect()  # Sets enemy rect
-        self.rect.x = self.x
-        self.rect.y = self.y
+        self.rect.x = x * TILESIZE
+        self.rect.y = y * TILESIZE
+        self.game.entities.add(self)  # registers the enemy in the spatial hash
+        # position at the start of the last tick, for interpolated drawing
+        self.prev_pos = self.rect.topleft
 
-        # set enemy animation cells (for animation strips)
-        self.up_animations = [
-            self.game.enemy_spritesheet.get_sprite(3, 2, self.width, self.height),
-            self.game.enemy_spritesheet.get_sprite(35, 2, self.width, self.height),
-            self.game.enemy_spritesheet.get_sprite(68, 2, self.width, self.height),
-        ]
-
-        self.down_animations = [
-            self.game.enemy_spritesheet.get_sprite(3, 34, self.width, self.height),
-            self.game.enemy_spritesheet.get_sprite(35, 34, self.width, self.height),
-            self.game.enemy_spritesheet.get_sprite(68, 34, self.width, self.height),
-        ]
-
-        self.left_animations = [
-            self.game.enemy_spritesheet.get_sprite(3, 98, self.width, self.height),
-            self.game.enemy_spritesheet.get_sprite(35, 98, self.width, self.height),
-            self.game.enemy_spritesheet.get_sprite(68, 98, self.width, self.height),
-        ]
-
-        self.right_animations = [
-            self.game.enemy_spritesheet.get_sprite(3, 66, self.width, self.height),
-            self.game.enemy_spritesheet.get_sprite(35, 66, self.width, self.height),
-            self.game.enemy_spritesheet.get_sprite(68, 66, self.width, self.height),
-        ]
+        # stores the enemy in the swarm, slot is its index in the arrays
+        self.slot = self.game.swarm.add(self, self.rect.x, self.rect.y)
 
-    def update(self):
-        self.movement()
-        self.animate()
+    @property
+    def facing(self):
+        # facing direction, read from the swarm
+        return FACINGS[self.game.swarm.facing[self.slot]]
 
-        self.rect.x += self.x_change
-        self.rect.y += self.y_change
+    def kill(self):
+        # frees the enemy's slot in the swarm as well as removing it from its groups
+        if self.alive():
+            self.game.swarm.remove(self.slot)
+        pygame.sprite.Sprite.kill(self)
 
-        self.x_change = 0
-        self.y_change = 0
 
-    def movement(self):
-        if self.facing == "down":
-            # movement set to enemy speed (neg for down and left)
-            self.y_change -= ENEMY_SPEED
-            # adds to movement loop to track distance traveled
-            self.movement_loop -= 1
-            # if the movement loop has hit the threshold, change direction
-            # movement threshold is set randomly by the max_travel variable
-            if self.movement_loop <= -self.max_travel:
-                self.facing = random.choice(["up", "down", "left", "right"])
-
-        if self.facing == "up":
-            self.y_change += ENEMY_SPEED
-            self.movement_loop += 1
-            if self.movement_loop >= self.max_travel:
-                self.facing = random.choice(["up", "down", "left", "right"])
-
-        if self.facing == "left":
-            self.x_change -= ENEMY_SPEED
-            self.movement_loop -= 1
-            if self.movement_loop <= -self.max_travel:
-                self.facing = random.choice(["up", "down", "left", "right"])
-
-        if self.facing == "right":
-            self.x_change += ENEMY_SPEED
-            self.movement_loop += 1
-            if self.movement_loop >= self.max_travel:
-                self.facing = random.choice(["up", "down", "left", "right"])
-
-    def animate(self):
-        if self.facing == "down":
-            # if the player is not moving, set the player image to the first frame of the animation
-            if self.x_change == 0 and self.y_change == 0:
-                self.image = self.down_animations[0]
-            else:
-                # sets the player image to the current frame of the animation
-                self.image = self.down_animations[math.floor(self.animation_loop)]
-                # adds to the animation loop
-                self.animation_loop += 0.1
-                # if the animation loop is greater than the length of the animation, reset the animation loop
-                if self.animation_loop >= len(self.down_animations):
-                    self.animation_loop = 1
-
-        if self.facing == "up":
-            if self.x_change == 0 and self.y_change == 0:
-                self.image = self.up_animations[0]
-            else:
-                self.image = self.up_animations[math.floor(self.animation_loop)]
-                self.animation_loop += 0.1
-                if self.animation_loop >= len(self.up_animations):
-                    self.animation_loop = 1
-
-        if self.facing == "left":
-            if self.x_change == 0 and self.y_change == 0:
-                self.image = self.left_animations[0]
-            else:
-                self.image = self.left_animations[math.floor(self.animation_loop)]
-                self.animation_loop += 0.1
-                if self.animation_loop >= len(self.left_animations):
-                    self.animation_loop = 1
-
-        if self.facing == "right":
-            if self.x_change == 0 and self.y_change == 0:
-                self.image = self.right_animations[0]
-            else:
-                self.image = self.right_animations[math.floor(self.animation_loop)]
-                self.animation_loop += 0.1
-                if self.animation_loop >= len(self.right_animations):
-                    self.animation_loop = 1
+class Torch(pygame.sprite.Sprite):
+    def __init__(self, game, x, y):
+        # Torch sprite init
+        # A wall torch from the dungeon pack, it flickers and lights up the tiles around it
+        # on dark levels (see lighting.py)
+        self.game = game
+        self._layer = BLOCK_LAYER
+        self.groups = self.game.all_sprites
+        pygame.sprite.Sprite.__init__(self, self.groups)
+
+        self.image = self.game.torch_clips["burn"].frames[0]
+        self.rect = self.image.get_rect()
+        self.rect.x = x * TILESIZE
+        self.rect.y = y * TILESIZE
+        self.game.entities.add(self)  # registers the torch in the spatial hash for drawing
+        # torches don't move, there is nothing to interpolate
+        self.prev_pos = self.rect.topleft
+
+        self.animator = Animator(self, self.game.torch_clips, "burn")
+        self.game.animations.add(self.animator)
 
 
 class Button:
     def __init__(self, x, y, width, height, fg, bg, content, fontsize):
         # Button init
-        # set button font
-        self.font = pygame.font.Font(
-            "D:\\Projects\\Game\\RPG\\images\\img\\img\\fonts\\Roboto\\Roboto-Medium.ttf",
-            fontsize,
-        )
+        # set button font, shared with every other button of the same size
+        self.font = load_font("fonts/Roboto/Roboto-Medium.ttf", fontsize)
 
         # set button content
         self.content = content
@@ -507,15 +353,14 @@ class Button:
         self.text_rect = self.text.get_rect(center=(self.width / 2, self.height / 2))
         self.image.blit(self.text, self.text_rect)
 
-    def is_pressed(self, pos, pressed):
-        # checks if button is pressed
-        if self.rect.collidepoint(pos):
-            # if the button is pressed, return True
-            # [0] is the left mouse button, [1] is the middle mouse button, [2] is the right mouse button
-            if pressed[0]:
-                return True
-            return False
-        return False
+    def is_clicked(self, event):
+        # checks if an event is a click on the button
+        # button 1 is the left mouse button, 2 the middle one and 3 the right one
+        return (
+            event.type == pygame.MOUSEBUTTONDOWN
+            and event.button == 1
+            and self.rect.collidepoint(event.pos)
+        )
 
     def update_position(self, screen_width, screen_height):
         # Update the position of the button based on the screen size
@@ -524,24 +369,20 @@ class Button:
 
 
 class Attack(pygame.sprite.Sprite):
-    def __init__(self, game, x, y):
+    def __init__(self, game):
         # Attack sprite init
+        # Attacks are pooled: the sprite is built once, then reset() every time it is swung
+        # and released back to game.attack_pool when the swing ends
         self.game = game
         self._layer = PLAYER_LAYER
-        # sets sprite group
-        self.groups = self.game.all_sprites, self.game.attacks
+        # sets sprite group, joined in reset()
+        self.groups = self.game.all_sprites, self.game.attacks, self.game.entities
         # initializes sprite
-        pygame.sprite.Sprite.__init__(self, self.groups)
+        pygame.sprite.Sprite.__init__(self)
 
-        # sets sprite x/y
-        self.x = x
-        self.y = y
         self.width = TILESIZE
         self.height = TILESIZE
 
-        # sets animation loop
-        self.animation_loop = 0
-
         # sets sprite image
         self.image = self.game.attack_spritesheet.get_sprite(
             3, 2, self.width, self.height
@@ -549,72 +390,38 @@ class Attack(pygame.sprite.Sprite):
 
         # sets sprite rect
         self.rect = self.image.get_rect()
-        self.rect.x = self.x
-        self.rect.y = self.y
-
-        # sets sprite direction
-        self.right_animations = [
-            self.game.attack_spritesheet.get_sprite(0, 64, self.width, self.height),
-            self.game.attack_spritesheet.get_sprite(32, 64, self.width, self.height),
-            self.game.attack_spritesheet.get_sprite(64, 64, self.width, self.height),
-            self.game.attack_spritesheet.get_sprite(96, 64, self.width, self.height),
-            self.game.attack_spritesheet.get_sprite(128, 64, self.width, self.height),
-        ]
-
-        self.down_animations = [
-            self.game.attack_spritesheet.get_sprite(0, 32, self.width, self.height),
-            self.game.attack_spritesheet.get_sprite(32, 32, self.width, self.height),
-            self.game.attack_spritesheet.get_sprite(64, 32, self.width, self.height),
-            self.game.attack_spritesheet.get_sprite(96, 32, self.width, self.height),
-            self.game.attack_spritesheet.get_sprite(128, 32, self.width, self.height),
-        ]
-
-        self.left_animations = [
-            self.game.attack_spritesheet.get_sprite(0, 96, self.width, self.height),
-            self.game.attack_spritesheet.get_sprite(32, 96, self.width, self.height),
-            self.game.attack_spritesheet.get_sprite(64, 96, self.width, self.height),
-            self.game.attack_spritesheet.get_sprite(96, 96, self.width, self.height),
-            self.game.attack_spritesheet.get_sprite(128, 96, self.width, self.height),
-        ]
-
-        self.up_animations = [
-            self.game.attack_spritesheet.get_sprite(0, 0, self.width, self.height),
-            self.game.attack_spritesheet.get_sprite(32, 0, self.width, self.height),
-            self.game.attack_spritesheet.get_sprite(64, 0, self.width, self.height),
-            self.game.attack_spritesheet.get_sprite(96, 0, self.width, self.height),
-            self.game.attack_spritesheet.get_sprite(128, 0, self.width, self.height),
-        ]
+        # position at the start of the last tick, for interpolated drawing
+        self.prev_pos = self.rect.topleft
+
+        # sets sprite animation, one one-shot clip per direction
+        self.animator = Animator(self, self.game.attack_clips, "down")
+
+    def reset(self, x, y):
+        # starts a new swing at x/y (world space)
+        self.rect.x = x
+        self.rect.y = y
+        self.prev_pos = self.rect.topleft
+        # joins the groups once the rect is set, the spatial hash needs it
+        self.add(*self.groups)
+        # swings in the direction the player faces
+        self.animator.play(self.game.player.facing, restart=True)
+        self.game.animations.add(self.animator)
+
+    def finish(self):
+        # called when the swing animation ends, returns the attack to the pool
+        self.game.attack_pool.release(self)
 
     def update(self):
-        self.animate()
         self.collide()
 
     def collide(self):
-        hits = pygame.sprite.spritecollide(self, self.game.enemies, True)
-
-    def animate(self):
-        direction = self.game.player.facing
-
-        if direction == "up":
-            self.image = self.up_animations[math.floor(self.animation_loop)]
-            self.animation_loop += 0.8
-            if self.animation_loop >= len(self.up_animations):
-                self.kill()
-
-        if direction == "down":
-            self.image = self.down_animations[math.floor(self.animation_loop)]
-            self.animation_loop += 0.8
-            if self.animation_loop >= len(self.down_animations):
-                self.kill()
-
-        if direction == "left":
-            self.image = self.left_animations[math.floor(self.animation_loop)]
-            self.animation_loop += 0.8
-            if self.animation_loop >= len(self.left_animations):
-                self.kill()
-
-        if direction == "right":
-            self.image = self.right_animations[math.floor(self.animation_loop)]
-            self.animation_loop += 0.8
-            if self.animation_loop >= len(self.right_animations):
-                self.kill()
+        # kills every enemy the attack overlaps, looked up through the spatial hash
+        hits = self.game.entities.collide(self, self.game.enemies)
+        for enemy in hits:
+            # a burst of sparks where the enemy was hit
+            self.game.particles.emit("sparks", enemy.rect.centerx, enemy.rect.centery, 24)
+            enemy.kill()
+        if hits:
+            # the noise of the fight carries, sleeping enemies around it start moving
+            radius = LOD_WAKE_RADIUS * TILESIZE
+            self.game.swarm.wake(self.rect.inflate(radius * 2, radius * 2))
@@ -0,0 +1,364 @@
+import random
+
+import numpy as np
+from config import *
+
+# facing codes used in the arrays, in the order of the enemy animation strips
+FACINGS = ["up", "down", "left", "right"]
+
+# movement direction per facing code, as in the old Enemy.movement
+# (an enemy facing "down" walks towards the top of the screen, like it always has)
+MOVE_X = np.array([0, 0, -1, 1])
+MOVE_Y = np.array([1, -1, 0, 0])
+# which way movement_loop counts while walking, it turns once it reaches +/- max_travel
+LOOP_STEP = np.array([1, -1, -1, 1])
+
+MAX_TRAVEL = 200  # longest walk before turning, in ticks
+
+# level of detail bands, see EnemySwarm.schedule
+LOD_ACTIVE = 0
+LOD_THROTTLED = 1
+LOD_SLEEPING = 2
+
+
+class EnemySwarm:
+    def __init__(self, game, capacity=64):
+        # Array-backed enemy store
+        # Every enemy's state lives in one slot of a set of NumPy arrays. step() moves and
+        # turns all of them at once, animate() picks every enemy's frame at once. The Enemy
+        # sprites are only views of a slot, used for drawing, collision queries and killing.
+        self.game = game
+        self.count = 0
+        self.sprites = []  # slot -> Enemy sprite
+        self.speed = ENEMY_SPEED  # pixels per tick, the batch runner tunes it per session
+
+        # random directions and walk lengths, seeded from the random module so seeded runs repeat
+        self.rng = np.random.default_rng(random.getrandbits(32))
+
+        self.x = np.zeros(capacity, np.int32)
+        self.y = np.zeros(capacity, np.int32)
+        self.facing = np.zeros(capacity, np.int8)
+        self.movement_loop = np.zeros(capacity, np.int32)
+        self.max_travel = np.zeros(capacity, np.int32)
+        self.animation_time = np.zeros(capacity, np.float32)  # seconds into the walk clip
+        # frame and facing each sprite view is showing, so images are only swapped on change
+        self.frame = np.zeros(capacity, np.int8)
+        self.drawn_facing = np.zeros(capacity, np.int8)
+
+        # Simulation level of detail
+        # Only enemies near the player are stepped every tick, far ones are stepped less
+        # often or not at all (see schedule), so on a big map the update cost follows
+        # what is around the player instead of how many enemies the map holds
+        self.tick = 0
+        self.lod = np.zeros(capacity, np.int8)  # LOD_ACTIVE, LOD_THROTTLED or LOD_SLEEPING
+        self.last_step = np.zeros(capacity, np.int32)  # tick the enemy was last stepped
+        self.awake_until = np.zeros(capacity, np.int32)  # woken up until this tick, see wake()
+        self.lod_counts = {"active": 0, "throttled": 0, "sleeping": 0}  # as of the last step
+
+        # walk clips by facing code, shared by every enemy
+        clips = [self.game.enemy_clips["walk_" + name] for name in FACINGS]
+        self.frames = [clip.frames for clip in clips]
+        self.frame_duration = np.array([clip.frame_duration for clip in clips])
+        self.frame_count = np.array([len(clip.frames) for clip in clips])
+
+    def grow(self):
+        # doubles the capacity of every array
+        for name in [
+            "x",
+            "y",
+            "facing",
+            "movement_loop",
+            "max_travel",
+            "animation_time",
+            "frame",
+            "drawn_facing",
+            "lod",
+            "last_step",
+            "awake_until",
+        ]:
+            array = getattr(self, name)
+            grown = np.zeros(len(array) * 2, array.dtype)
+            grown[: len(array)] = array
+            setattr(self, name, grown)
+
+    def add(self, sprite, x, y):
+        # stores a new enemy at world position x/y, returns its slot
+        if self.count == len(self.x):
+            self.grow()
+        slot = self.count
+        self.x[slot] = x
+        self.y[slot] = y
+        self.facing[slot] = self.rng.integers(4)
+        self.movement_loop[slot] = 0
+        self.max_travel[slot] = self.rng.integers(1, MAX_TRAVEL + 1)
+        self.animation_time[slot] = 0
+        self.frame[slot] = 0
+        self.drawn_facing[slot] = -1  # the view's image is set on the first animate
+        self.lod[slot] = LOD_ACTIVE
+        self.last_step[slot] = self.tick
+        self.awake_until[slot] = 0
+        self.sprites.append(sprite)
+        self.count += 1
+        return slot
+
+    def remove(self, slot):
+        # removes an enemy by moving the last one into its slot, so the arrays stay packed
+        last = self.count - 1
+        if slot != last:
+            for array in [
+                self.x,
+                self.y,
+                self.facing,
+                self.movement_loop,
+                self.max_travel,
+                self.animation_time,
+                self.frame,
+                self.drawn_facing,
+                self.lod,
+                self.last_step,
+                self.awake_until,
+            ]:
+                array[slot] = array[last]
+            moved = self.sprites[last]
+            moved.slot = slot
+            self.sprites[slot] = moved
+        self.sprites.pop()
+        self.count = last
+
+    def collide_walls(self, position, other, step, axis_x):
+        # stops enemies that walked into a wall along one axis
+        # position is the moving coordinate, other the fixed one, step the signed movement
+        # returns a mask of the enemies that hit a wall
+        moving = step != 0
+        # the edge of the rect that leads the movement
+        edge = np.where(step > 0, position + TILESIZE - 1, position)
+        lead = edge // TILESIZE
+        first = other // TILESIZE
+        last = (other + TILESIZE - 1) // TILESIZE
+        if axis_x:
+            hit = self.game.grid.solid_at(lead, first) | self.game.grid.solid_at(lead, last)
+        else:
+            hit = self.game.grid.solid_at(first, lead) | self.game.grid.solid_at(last, lead)
+        hit &= moving
+
+        # pushes the rect back to the side of the wall tile it came from
+        back = np.where(step > 0, lead * TILESIZE - TILESIZE, (lead + 1) * TILESIZE)
+        position[hit] = back[hit]
+        return hit
+
+    def move_axis(self, position, other, step, axis_x, longest):
+        # moves enemies along one axis, returns a mask of the enemies that hit a wall
+        # collide_walls only looks at the tile the leading edge ends up in, so a step longer
+        # than a tile could jump over a wall: long steps (fast or catching up enemies, up to
+        # longest pixels) are walked a tile at a time
+        if longest <= TILESIZE:
+            position += step
+            return self.collide_walls(position, other, step, axis_x)
+        hit = np.zeros(len(position), bool)
+        remaining = step.copy()
+        while remaining.any():
+            part = np.clip(remaining, -TILESIZE, TILESIZE)
+            position += part
+            hit |= self.collide_walls(position, other, part, axis_x)
+            remaining -= part
+            remaining[hit] = 0
+        return hit
+
+    def tile_offset(self, position):
+        # distance from a position to the start of the tile its centre is in
+        return (position + TILESIZE // 2) // TILESIZE * TILESIZE - position
+
+    def steer(self, x, y, facing):
+        # points enemies that the flow field reaches at the player, returns a mask of them
+        field = self.game.pathfinder.field
+        if field is None:
+            return np.zeros(len(x), bool)
+        cols = (x + TILESIZE // 2) // TILESIZE
+        rows = (y + TILESIZE // 2) // TILESIZE
+        direction = field.direction_at(cols, rows)
+        chasing = direction >= 0
+        facing[chasing] = direction[chasing]
+        return chasing
+
+    def schedule(self, n):
+        # sorts the enemies into level of detail bands for this tick:
+        #   active     around the camera view and within reach of the flow field, stepped every tick
+        #   throttled  within LOD_THROTTLE_RADIUS tiles of the player (or woken up), stepped every
+        #              LOD_INTERVAL ticks with all the ticks they missed at once
+        #   sleeping   everything further away, not stepped at all until the player comes close
+        # returns the slots due a step this tick (a slice if that's every enemy) and the ticks
+        # each of them has to catch up on
+        x = self.x[:n]
+        y = self.y[:n]
+        tick = self.tick
+        view = self.game.camera.rect
+        player = self.game.player.rect
+
+        margin = LOD_ACTIVE_MARGIN * TILESIZE
+        active = (
+            (x > view.left - margin - TILESIZE)
+            & (x < view.right + margin)
+            & (y > view.top - margin - TILESIZE)
+            & (y < view.bottom + margin)
+        )
+        # enemies the flow field can reach chase the player, so they are never throttled
+        dx = np.abs(x - player.x)
+        dy = np.abs(y - player.y)
+        reach = (FLOW_RADIUS + 1) * TILESIZE
+        active |= (dx <= reach) & (dy <= reach)
+
+        near = np.maximum(dx, dy) <= LOD_THROTTLE_RADIUS * TILESIZE
+        throttled = ~active & (near | (self.awake_until[:n] > tick))
+        sleeping = ~(active | throttled)
+
+        lod = self.lod[:n]
+        lod[:] = LOD_SLEEPING
+        lod[active] = LOD_ACTIVE
+        lod[throttled] = LOD_THROTTLED
+        active_count = int(np.count_nonzero(active))
+        throttled_count = int(np.count_nonzero(throttled))
+        self.lod_counts["active"] = active_count
+        self.lod_counts["throttled"] = throttled_count
+        self.lod_counts["sleeping"] = n - active_count - throttled_count
+
+        last_step = self.last_step[:n]
+        # time stands still for sleeping enemies, woken up they carry on where they stopped
+        last_step[sleeping] = tick - 1
+        if active_count == n:
+            last_step[:] = tick
+            return slice(0, n), 1
+
+        # throttled enemies take turns by slot, so their steps are spread over the interval
+        due = active | (throttled & ((np.arange(n) + tick) % LOD_INTERVAL == 0))
+        slots = np.nonzero(due)[0]
+        ticks = np.minimum(tick - last_step[slots], LOD_INTERVAL)
+        last_step[slots] = tick
+        return slots, ticks
+
+    def wake(self, rect, ticks=LOD_WAKE_TICKS):
+        # keeps the enemies inside rect (world space) stepping for a number of ticks, however
+        # far they are from the player, for events that should set far away enemies moving
+        n = self.count
+        x = self.x[:n]
+        y = self.y[:n]
+        inside = (
+            (x < rect.right)
+            & (x + TILESIZE > rect.left)
+            & (y < rect.bottom)
+            & (y + TILESIZE > rect.top)
+        )
+        self.awake_until[:n][inside] = self.tick + ticks
+
+    def step(self):
+        # moves and turns every enemy that is due a step in one batch
+        self.tick += 1
+        n = self.count
+        if n == 0:
+            self.lod_counts.update(active=0, throttled=0, sleeping=0)
+            return
+        slots, ticks = self.schedule(n)
+
+        # a slice of every enemy is a view of the arrays, slots are copied and written back
+        x = self.x[slots]
+        y = self.y[slots]
+        facing = self.facing[slots]
+        loop = self.movement_loop[slots]
+        max_travel = self.max_travel[slots]
+
+        old_x = x.copy()
+        old_y = y.copy()
+
+        # enemies within reach of the player follow the flow field, the rest wander
+        chasing = self.steer(x, y, facing)
+
+        # walks in the facing direction, throttled enemies as far as they would have
+        # walked in every tick since their last step
+        speed = self.speed * ticks
+        dx = MOVE_X[facing] * speed
+        dy = MOVE_Y[facing] * speed
+        step = LOOP_STEP[facing]
+        loop += step * ticks
+
+        # chasing enemies line up with the tile row or column before turning a corner,
+        # so they don't clip the corner of a wall
+        align_x = chasing & (dy != 0) & (x % TILESIZE != 0)
+        align_y = chasing & (dx != 0) & (y % TILESIZE != 0)
+        if align_x.any() or align_y.any():
+            dx = np.where(align_x, np.clip(self.tile_offset(x), -speed, speed), dx)
+            dy = np.where(align_x, 0, dy)
+            dy = np.where(align_y, np.clip(self.tile_offset(y), -speed, speed), dy)
+            dx = np.where(align_y, 0, dx)
+
+        longest = self.speed * np.max(ticks)
+        hit = self.move_axis(x, y, dx, True, longest)
+        hit |= self.move_axis(y, x, dy, False, longest)
+
+        # turns when the walk is over or a wall is in the way; walls also start a new walk
+        walked = ((step > 0) & (loop >= max_travel)) | ((step < 0) & (loop <= -max_travel))
+        turn = (hit | walked) & ~chasing
+        loop[hit] = 0
+        turning = np.count_nonzero(turn)
+        if turning:
+            facing[turn] = self.rng.integers(4, size=turning)
+
+        self.x[slots] = x
+        self.y[slots] = y
+        self.facing[slots] = facing
+        self.movement_loop[slots] = loop
+
+        # copies the results into the sprite views
+        self.sync(slots, x, y, old_x, old_y)
+
+    def animate(self, dt):
+        # advances every enemy's walk clip by dt seconds, called by the animation system
+        n = self.count
+        if n == 0:
+            return
+        facing = self.facing[:n]
+        time = self.animation_time[:n]
+        time += dt
+        # wraps the clocks at the end of the clip, so they never lose float precision
+        duration = self.frame_duration[facing]
+        count = self.frame_count[facing]
+        time %= duration * count
+        frame = np.minimum(time // duration, count - 1).astype(np.int8)
+
+        # only sprites whose frame or facing changed need a new image, and only active
+        # enemies are near enough to be seen; the others catch up once they are active again
+        changed_image = np.nonzero(
+            ((frame != self.frame[:n]) | (facing != self.drawn_facing[:n]))
+            & (self.lod[:n] == LOD_ACTIVE)
+        )[0]
+        self.frame[changed_image] = frame[changed_image]
+        self.drawn_facing[changed_image] = facing[changed_image]
+
+        sprites = self.sprites
+        frames = self.frames
+        for slot, sprite_facing, sprite_frame in zip(
+            changed_image.tolist(),
+            facing[changed_image].tolist(),
+            frame[changed_image].tolist(),
+        ):
+            sprites[slot].image = frames[sprite_facing][sprite_frame]
+
+    def sync(self, slots, x, y, old_x, old_y):
+        # updates rects and spatial hash cells of the sprite views of the stepped slots
+        # x/y are the new positions of those slots, old_x/old_y where they were before
+        # only sprites that crossed into another spatial hash cell need re-bucketing
+        cell = self.game.entities.cell_size
+        changed_cell = np.nonzero(
+            (x // cell != old_x // cell) | (y // cell != old_y // cell)
+        )[0]
+
+        if isinstance(slots, slice):
+            sprites = self.sprites[slots]
+        else:
+            sprites = [self.sprites[slot] for slot in slots.tolist()]
+        for sprite, sprite_x, sprite_y in zip(sprites, x.tolist(), y.tolist()):
+            rect = sprite.rect
+            sprite.prev_pos = rect.topleft
+            rect.x = sprite_x
+            rect.y = sprite_y
+        move = self.game.entities.move
+        for index in changed_cell.tolist():
+            move(sprites[index])
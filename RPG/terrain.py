@@ -0,0 +1,286 @@
+import math
+
+import numpy as np
+import pygame
+from assets import load_image
+from config import *
+
+
+class TileLayer:
+    def __init__(self, game, tilemap):
+        # Static terrain layer
+        # The terrain never moves, so instead of one sprite per tile it is rendered once
+        # into chunk surfaces of CHUNK_SIZE x CHUNK_SIZE tiles and drawn with a few blits per frame.
+        # Chunks are streamed: only those around the camera are built and kept, so the size
+        # of the map changes neither the start-up time nor the memory the terrain takes.
+        self.game = game
+
+        # tilemap is a TileMap (mapfile.py), the layer reads and changes its tile ids
+        self.map = tilemap
+        self.tiles = tilemap.tiles
+        self.rows = tilemap.rows
+        self.cols = tilemap.cols
+        self.width = self.cols * TILESIZE
+        self.height = self.rows * TILESIZE
+
+        # ground is drawn under every cell, other tiles are drawn on top of it
+        self.ground_image = self.game.terrain_spritesheet.get_sprite(
+            64, 352, TILESIZE, TILESIZE
+        )
+        self.tile_images = self.load_tile_images()
+
+        # chunk surfaces by (chunk column, chunk row), only for chunks near the camera
+        self.chunk_pixels = CHUNK_SIZE * TILESIZE
+        self.chunk_cols = -(-self.cols // CHUNK_SIZE)  # ceiling division
+        self.chunk_rows = -(-self.rows // CHUNK_SIZE)
+        self.chunks = {}
+
+        # built chunks whose tiles changed, they are rebuilt on the next draw
+        self.dirty = set()
+
+    def load_tile_images(self):
+        # returns the image of every tile id, None draws just the ground
+        images = [None] * self.map.tile_count()
+        character_images = {
+            "B": self.game.terrain_spritesheet.get_sprite(960, 448, TILESIZE, TILESIZE),
+        }
+        for tile_id, char in enumerate(self.map.palette):
+            images[tile_id] = character_images.get(char)
+        for tileset in self.map.tilesets:
+            sheet = load_image(tileset["image"], alpha=True)
+            for index in range(tileset["count"]):
+                col, row = index % tileset["columns"], index // tileset["columns"]
+                images[tileset["firstid"] + index] = sheet.subsurface(
+                    (col * TILESIZE, row * TILESIZE, TILESIZE, TILESIZE)
+                )
+        return images
+
+    def get_tile(self, col, row):
+        # returns the text map character at a map cell, anything outside the map counts as empty
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            tile_id = int(self.tiles[row, col])
+            if tile_id < len(self.map.palette) and self.map.palette[tile_id] is not None:
+                return self.map.palette[tile_id]
+        return " "
+
+    def set_tile(self, col, row, tile):
+        # changes a tile (a text map character) and marks only its chunk for rebuilding
+        # returns whether the tile changed
+        # the tiles are shared with the TileGrid, so tiles are only changed through
+        # Game.set_tile, which keeps both in sync
+        tile_id = self.map.char_id(tile)
+        while len(self.tile_images) <= tile_id:
+            self.tile_images.append(None)
+        if self.tiles[row, col] == tile_id:
+            return False
+        self.tiles[row, col] = tile_id
+        chunk = (col // CHUNK_SIZE, row // CHUNK_SIZE)
+        # chunks that aren't built pick the change up when they are
+        if chunk in self.chunks:
+            self.dirty.add(chunk)
+        return True
+
+    def build_chunk(self, cx, cy):
+        # renders every tile of one chunk onto a single surface
+        first_col = cx * CHUNK_SIZE
+        first_row = cy * CHUNK_SIZE
+        last_col = min(first_col + CHUNK_SIZE, self.cols)
+        last_row = min(first_row + CHUNK_SIZE, self.rows)
+
+        surface = pygame.Surface(
+            ((last_col - first_col) * TILESIZE, (last_row - first_row) * TILESIZE)
+        ).convert()
+        surface.fill(BLACK)
+
+        # one read of the chunk's tiles, from a memory-mapped map this pages them in
+        tiles = self.tiles[first_row:last_row, first_col:last_col].tolist()
+        ground = self.ground_image
+        images = self.tile_images
+        for y, row in enumerate(tiles):
+            for x, tile_id in enumerate(row):
+                pos = (x * TILESIZE, y * TILESIZE)
+                surface.blit(ground, pos)
+                image = images[tile_id]
+                if image is not None:
+                    surface.blit(image, pos)
+
+        self.chunks[(cx, cy)] = surface
+
+    def rebuild(self):
+        # rebuilds only the chunks whose tiles changed since the last draw
+        for cx, cy in self.dirty:
+            self.build_chunk(cx, cy)
+        self.dirty.clear()
+
+    def chunk_range(self, rect, margin=0):
+        # returns the range of chunks a rect (world space) covers, widened by margin chunks
+        return (
+            max(rect.left // self.chunk_pixels - margin, 0),
+            max(rect.top // self.chunk_pixels - margin, 0),
+            min((rect.right - 1) // self.chunk_pixels + margin, self.chunk_cols - 1),
+            min((rect.bottom - 1) // self.chunk_pixels + margin, self.chunk_rows - 1),
+        )
+
+    def stream(self, view):
+        # loads the chunks around the view and unloads those far from it
+        # the ring of CHUNK_PRELOAD chunks around the view is built ahead, a few per frame,
+        # so walking into it doesn't stall a frame; chunks inside the view are built by draw()
+        budget = CHUNK_BUILDS_PER_FRAME
+        x0, y0, x1, y1 = self.chunk_range(view, CHUNK_PRELOAD)
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                if budget and (cx, cy) not in self.chunks:
+                    self.build_chunk(cx, cy)
+                    budget -= 1
+
+        # one more chunk is kept around the preloaded ring, so walking back and forth
+        # over a chunk border doesn't rebuild the same chunks
+        x0, y0, x1, y1 = self.chunk_range(view, CHUNK_PRELOAD + 1)
+        for cx, cy in list(self.chunks):
+            if not (x0 <= cx <= x1 and y0 <= cy <= y1):
+                del self.chunks[(cx, cy)]
+                self.dirty.discard((cx, cy))
+
+    def draw(self, surface, view, area=None):
+        # draws the chunks that intersect the view rect (world space), one blit per chunk
+        # area (in world space) narrows the drawing down to part of the view
+        # returns how many chunks were drawn and how many were culled
+        if self.dirty:
+            self.rebuild()
+
+        offset_x, offset_y = view.topleft
+        if area is None:
+            self.stream(view)
+        else:
+            view = area
+        first_cx, first_cy, last_cx, last_cy = self.chunk_range(view)
+
+        drawn = 0
+        chunks = self.chunks
+        for cy in range(first_cy, last_cy + 1):
+            for cx in range(first_cx, last_cx + 1):
+                # chunks inside the view are needed now, whatever the preload budget
+                if (cx, cy) not in chunks:
+                    self.build_chunk(cx, cy)
+                surface.blit(
+                    chunks[(cx, cy)],
+                    (
+                        cx * self.chunk_pixels - offset_x,
+                        cy * self.chunk_pixels - offset_y,
+                    ),
+                )
+                drawn += 1
+        return drawn, self.chunk_cols * self.chunk_rows - drawn
+
+
+class TileGrid:
+    def __init__(self, tilemap):
+        # Solid-tile collision index
+        # Walls are looked up by tile index instead of testing every wall sprite,
+        # so a collision check only touches the few tiles under a rect.
+        # Tile ids are turned into solid flags through a table, so nothing is computed for
+        # the whole map up front and a memory-mapped map stays on disk until it is needed.
+        self.map = tilemap
+        self.tiles = tilemap.tiles
+        self.rows = tilemap.rows
+        self.cols = tilemap.cols
+        self.solid_ids = tilemap.solid_ids()  # tile id -> solid
+        self.solid_list = self.solid_ids.tolist()  # the same, faster to index one at a time
+
+        # goes up on every change, so caches built from the grid know when they are stale
+        self.version = 0
+
+    def is_solid(self, col, row):
+        # anything outside the map is solid so entities can't leave it
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            return self.solid_list[self.tiles[row, col]]
+        return True
+
+    def solid_at(self, cols, rows):
+        # is_solid for arrays of columns and rows, anything outside the map is solid
+        inside = (cols >= 0) & (cols < self.cols) & (rows >= 0) & (rows < self.rows)
+        if inside.all():
+            return self.solid_ids[self.tiles[rows, cols]]
+        solid = np.ones(len(cols), bool)
+        solid[inside] = self.solid_ids[self.tiles[rows[inside], cols[inside]]]
+        return solid
+
+    def solid_window(self, col0, row0, width, height):
+        # returns the solid flags of a block of cells, cells outside the map are solid
+        window = np.ones((height, width), bool)
+        top = max(row0, 0)
+        left = max(col0, 0)
+        bottom = min(row0 + height, self.rows)
+        right = min(col0 + width, self.cols)
+        if top < bottom and left < right:
+            window[top - row0 : bottom - row0, left - col0 : right - col0] = self.solid_ids[
+                self.tiles[top:bottom, left:right]
+            ]
+        return window
+
+    def set_tile(self, col, row, tile):
+        # changes a tile (a text map character) and keeps the solid table in sync
+        # only called by Game.set_tile, which also redraws the tile on the TileLayer
+        tile_id = self.map.char_id(tile)
+        self.tiles[row, col] = tile_id
+        if tile_id >= len(self.solid_ids):
+            # a character added after the tilesets of a uint16 map
+            self.solid_ids = np.append(
+                self.solid_ids, np.zeros(tile_id + 1 - len(self.solid_ids), bool)
+            )
+            self.solid_list = self.solid_ids.tolist()
+        self.solid_ids[tile_id] = tile in SOLID_TILES
+        self.solid_list[tile_id] = tile in SOLID_TILES
+        self.version += 1
+
+    def collide_rect(self, rect):
+        # returns the rects of every solid tile overlapping rect
+        # only the tiles covered by rect are checked, so the cost doesn't depend on map size
+        hits = []
+        for row in range(rect.top // TILESIZE, (rect.bottom - 1) // TILESIZE + 1):
+            for col in range(rect.left // TILESIZE, (rect.right - 1) // TILESIZE + 1):
+                if self.is_solid(col, row):
+                    hits.append(
+                        pygame.Rect(col * TILESIZE, row * TILESIZE, TILESIZE, TILESIZE)
+                    )
+        return hits
+
+    def sweep_axis(self, position, other, size, other_size, delta, axis_x):
+        # moves a rect along one axis, through every tile between where it is and where it
+        # ends up, and stops it at the first solid tile in its way
+        # position is the moving float coordinate, other the fixed one
+        # returns the new position and whether a wall stopped the rect
+        if delta == 0:
+            return position, False
+        # the tiles the rect covers across the direction it moves in
+        other = math.floor(other)
+        first = other // TILESIZE
+        last = (other + other_size - 1) // TILESIZE
+
+        if delta > 0:
+            # the column (or row) of the leading edge, now and at the end of the move
+            start = (math.floor(position) + size - 1) // TILESIZE
+            end = (math.floor(position + delta) + size - 1) // TILESIZE
+            lines = range(start + 1, end + 1)
+        else:
+            start = math.floor(position) // TILESIZE
+            end = math.floor(position + delta) // TILESIZE
+            lines = range(start - 1, end - 1, -1)
+
+        # the tiles the rect already overlaps don't stop it, so it can always move out
+        for line in lines:
+            for across in range(first, last + 1):
+                if self.is_solid(line, across) if axis_x else self.is_solid(across, line):
+                    # stops flush against the side of the wall it walked into
+                    if delta > 0:
+                        return line * TILESIZE - size, True
+                    return (line + 1) * TILESIZE, True
+        return position + delta, False
+
+    def sweep(self, x, y, width, height, dx, dy):
+        # moves a rect with a float position by dx, dy, one axis at a time so it slides
+        # along walls; a move of any length stops at the first wall, nothing tunnels
+        # returns the new position and which axes hit a wall
+        x, hit_x = self.sweep_axis(x, y, width, height, dx, True)
+        y, hit_y = self.sweep_axis(y, x, height, width, dy, False)
+        return x, y, hit_x, hit_y
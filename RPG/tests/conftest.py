@@ -0,0 +1,30 @@
+import os
+import sys
+
+# the game runs headless in the tests, and its modules import each other by name
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from controls import Controls
+
+
+class Hold(Controls):
+    # input that holds the same actions on every tick
+    def __init__(self, actions):
+        Controls.__init__(self)
+        self.actions = actions
+
+    def read(self):
+        return self.actions
+
+
+@pytest.fixture(scope="session")
+def game():
+    # one Game for the whole run, every test starts its own session with game.new()
+    from rpg_game import Game
+
+    game = Game()
+    game.realtime = False
+    return game
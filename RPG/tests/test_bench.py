@@ -0,0 +1,22 @@
+import pytest
+from bench import PHASES, check_results, run_scenario
+from config import *
+from controls import Controls
+
+# a 60 FPS frame, every benchmark scenario has to stay well inside it
+FRAME_BUDGET_MS = 1000 / FPS
+
+
+@pytest.mark.parametrize("name", ["default", "enemies_1000", "attacks"])
+def test_scenario_fits_the_frame_budget(game, name):
+    game.controls = Controls()
+    result = run_scenario(game, name, 200, 1)
+    assert result["frame"]["p95"] < FRAME_BUDGET_MS
+
+
+def test_check_flags_a_regressed_phase():
+    baseline = {"attacks": {phase: {"p95": 1.0} for phase in PHASES}}
+    results = {"attacks": {phase: {"p95": 1.05} for phase in PHASES}}
+    results["attacks"]["update"]["p95"] = 2.0
+    failures = check_results(results, baseline)
+    assert len(failures) == 1 and "attacks update" in failures[0]
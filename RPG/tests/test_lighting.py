@@ -0,0 +1,36 @@
+import numpy as np
+import pygame
+from conftest import Hold
+from controls import ACTION_DOWN, ACTION_RIGHT
+from mapfile import generate_map
+from renderer import DirtyRenderer, Renderer
+
+
+def lit_pixels(surface):
+    # the number of pixels that aren't black
+    return int(np.count_nonzero(pygame.surfarray.array3d(surface).sum(axis=2)))
+
+
+def test_dark_level_stays_visible_when_the_camera_scrolls(game):
+    game.dark = True
+    game.level = generate_map(60, 40, 0, np.random.default_rng(5))
+    game.controls = Hold(ACTION_RIGHT | ACTION_DOWN)
+    full = Renderer(game)
+    dirty = DirtyRenderer(game)
+    try:
+        game.new(1)
+        start = game.camera.rect.topleft
+        compared = pygame.Surface(game.screen.get_size()).convert()
+        for _ in range(120):
+            game.update()
+            full.draw(game.screen)
+            dirty.draw(compared)
+            # the area around the player is in sight, so it is never all black
+            assert lit_pixels(game.screen) > 0
+            # partial redraws end up with the same frame as full ones
+            assert pygame.image.tobytes(game.screen, "RGB") == pygame.image.tobytes(
+                compared, "RGB"
+            )
+        assert game.camera.rect.topleft != start
+    finally:
+        game.dark = False
@@ -0,0 +1,33 @@
+import json
+
+from config import *
+from conftest import Hold
+
+
+def test_export_after_particles_expired(game, tmp_path):
+    game.level = tilemap
+    game.controls = Hold(0)
+    game.new(1)
+    game.profiler.toggle()
+    try:
+        player = game.player.rect
+        game.particles.emit("sparks", player.centerx, player.centery, 24)
+        for _ in range(FPS):
+            game.profiler.begin_frame()
+            game.update()
+            game.draw()
+        game.profiler.begin_frame()  # ends the last frame
+        assert game.particles.count() == 0
+
+        path = tmp_path / "trace.json"
+        game.profiler.export(str(path))
+        with open(path) as file:
+            trace = json.load(file)
+        particles = [
+            event["args"]["particles"]
+            for event in trace["traceEvents"]
+            if event["name"] == "frame"
+        ]
+        assert particles[0] > 0 and particles[-1] == 0
+    finally:
+        game.profiler.toggle()
@@ -0,0 +1,58 @@
+import random
+
+import numpy as np
+from controls import ACTION_ATTACK, ACTION_DOWN, ACTION_LEFT, ACTION_RIGHT, ACTION_UP
+from controls import Recorder, Replay
+from mapfile import generate_map, save_map
+
+TICKS = 900
+
+
+class Scripted(Recorder):
+    # a recorded player that walks around at random and swings often
+    def __init__(self, seed):
+        Recorder.__init__(self)
+        self.rng = random.Random(seed)
+
+    def read(self):
+        moves = [ACTION_LEFT, ACTION_RIGHT, ACTION_UP, ACTION_DOWN, 0]
+        return self.rng.choice(moves) | (ACTION_ATTACK if self.rng.random() < 0.3 else 0)
+
+
+def play(game, ticks):
+    # runs a session, returns the state of every tick
+    states = []
+    for _ in range(ticks):
+        if not game.playing:
+            break
+        game.update()
+        swarm = game.swarm
+        states.append(
+            (
+                game.player.rect.topleft,
+                swarm.count,
+                swarm.x[: swarm.count].tobytes(),
+                swarm.y[: swarm.count].tobytes(),
+            )
+        )
+    return states
+
+
+def test_replays_with_kills_are_identical(game, tmp_path):
+    level = str(tmp_path / "crowd.rpgmap")
+    save_map(generate_map(80, 60, 200, np.random.default_rng(3)), level)
+    session = str(tmp_path / "session.json")
+
+    game.level = level
+    game.controls = Scripted(7)
+    game.new(1234)
+    recorded = play(game, TICKS)
+    game.controls.save(session)
+    # the session only tests something if enemies died in it
+    assert recorded[-1][1] < recorded[0][1]
+
+    for _ in range(2):
+        game.controls = Replay(session)
+        game.level = game.controls.level
+        game.new(game.controls.seed)
+        assert play(game, TICKS) == recorded
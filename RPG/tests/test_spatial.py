@@ -0,0 +1,37 @@
+import random
+
+import pygame
+from config import *
+from spatial import SpatialHash
+
+
+class Entity(pygame.sprite.Sprite):
+    def __init__(self, x, y):
+        pygame.sprite.Sprite.__init__(self)
+        self.rect = pygame.Rect(x, y, TILESIZE, TILESIZE)
+
+
+def test_queries_match_a_full_scan_after_moves():
+    rng = random.Random(1)
+    entities = SpatialHash()
+    sprites = [
+        Entity(rng.randrange(-200, 600), rng.randrange(-200, 600)) for _ in range(300)
+    ]
+    entities.add(sprites)
+    for _ in range(50):
+        for sprite in sprites:
+            sprite.rect.move_ip(rng.randint(-20, 20), rng.randint(-20, 20))
+            entities.move(sprite)
+        area = pygame.Rect(rng.randrange(-200, 600), rng.randrange(-200, 600), 90, 70)
+        expected = {sprite for sprite in sprites if area.colliderect(sprite.rect)}
+        assert set(entities.query_rect(area)) == expected
+
+        center = (rng.randrange(0, 400), rng.randrange(0, 400))
+        near = entities.query_radius(center, 100)
+        assert set(near) == {
+            sprite
+            for sprite in sprites
+            if (sprite.rect.centerx - center[0]) ** 2
+            + (sprite.rect.centery - center[1]) ** 2
+            <= 100 * 100
+        }